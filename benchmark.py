@@ -0,0 +1,95 @@
+"""
+考试试卷生成系统 - 题库加载性能对比
+
+功能：
+1. 生成指定规模的模拟题库（判断题和单选题各半）
+2. 将同一题库分别保存为xlsx、CSV、TSV、JSONL格式
+3. 分别用ExamCore.load_excel加载，比较各格式的加载耗时
+4. 检查各格式加载后的清洗结果是否一致
+
+用法：
+- python benchmark.py [--count 题数] [--repeat 重复次数] [--formats xlsx csv ...]
+
+依赖：
+- core.ExamCore
+- pandas
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import pandas as pd
+from core import ExamCore, OPTION_COLUMNS
+
+# 各格式保存模拟题库的方式
+WRITERS = {
+    'xlsx': lambda data, path: data.to_excel(path, index=False),
+    'csv': lambda data, path: data.to_csv(path, index=False),
+    'tsv': lambda data, path: data.to_csv(path, sep='\t', index=False),
+    'jsonl': lambda data, path: data.to_json(path, orient='records', lines=True, force_ascii=False),
+}
+
+# 对比清洗结果时使用的列
+COMPARE_COLUMNS = ['题号', '题型', '题目'] + OPTION_COLUMNS + ['正确答案', '选项位图', '答案序号', '有效']
+
+def make_bank(count):
+    """生成模拟题库DataFrame"""
+    rows = []
+    for i in range(count):
+        if i % 2 == 0:
+            rows.append({'题型': '判断题', '题目': f"判断题目{i}：养老护理的基本原则是安全第一", '正确答案': i % 4 // 2,
+                         '选项A': None, '选项B': None, '选项C': None, '选项D': None})
+        else:
+            rows.append({'题型': '单选题', '题目': f"单选题目{i}：下列做法正确的是", '正确答案': "ABCD"[i % 4],
+                         '选项A': f"[A]选项{i}-1", '选项B': f"选项{i}-2", '选项C': f"选项{i}-3", '选项D': f"选项{i}-4"})
+    return pd.DataFrame(rows)
+
+def time_load(path, repeat):
+    """返回多次加载中的最短耗时（秒）和最后一次加载的ExamCore"""
+    best = None
+    for _ in range(repeat):
+        exam_core = ExamCore()
+        start = time.perf_counter()
+        exam_core.load_excel(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, exam_core
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="比较不同格式题库的加载耗时")
+    parser.add_argument("--count", type=int, default=20000, help="模拟题库题数")
+    parser.add_argument("--repeat", type=int, default=3, help="每种格式重复加载次数（取最短耗时）")
+    parser.add_argument("--formats", nargs="+", choices=list(WRITERS), default=list(WRITERS), help="参与比较的格式")
+    args = parser.parse_args(argv)
+    
+    bank = make_bank(args.count)
+    results = []
+    reference = None
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.formats:
+            path = os.path.join(directory, f"bank.{name}")
+            WRITERS[name](bank, path)
+            elapsed, exam_core = time_load(path, args.repeat)
+            
+            # 清洗后的题库应与格式无关
+            data = exam_core.exam_data[COMPARE_COLUMNS]
+            if reference is None:
+                reference = data
+                consistent = True
+            else:
+                consistent = data.astype(str).equals(reference.astype(str))
+            results.append((name, os.path.getsize(path), elapsed, consistent))
+    
+    print(f"题数: {args.count}，每种格式加载{args.repeat}次取最短耗时")
+    print(f"{'格式':<8}{'文件大小(KB)':>14}{'加载耗时(秒)':>14}{'相对xlsx':>10}  结果一致")
+    baseline = dict((name, elapsed) for name, _, elapsed, _ in results).get('xlsx')
+    for name, size, elapsed, consistent in results:
+        relative = f"{baseline / elapsed:.1f}x" if baseline else "-"
+        print(f"{name:<8}{size / 1024:>14.0f}{elapsed:>14.3f}{relative:>10}  {'是' if consistent else '否'}")
+    
+    return 0 if all(result[3] for result in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
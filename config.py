@@ -8,4 +8,19 @@
 DEFAULT_EXAM_TITLE = "（）考试试卷"
 
 # 默认考生信息
-DEFAULT_STUDENT_INFO = "姓名：__________  考号：__________"
\ No newline at end of file
+DEFAULT_STUDENT_INFO = "姓名：__________  考号：__________"
+
+# 试卷记录日志（追加写入，每行一条JSON记录）
+EXAM_RECORD_LOG = "exam_records.jsonl"
+
+# 题目检索：输入停止后延迟检索的毫秒数
+SEARCH_DELAY_MS = 150
+
+# 题目检索：最多显示的结果数
+SEARCH_RESULT_LIMIT = 100
+
+# 题库概况中题数条形图的最大宽度（字符数）
+SUMMARY_BAR_WIDTH = 20
+
+# 预览每写入多少段文本刷新一次界面
+PREVIEW_REFRESH_CHUNKS = 200
\ No newline at end of file
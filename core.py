@@ -5,381 +5,743 @@
 1. 加载和处理Excel题库数据
 2. 根据配置生成试卷内容
 3. 管理题目数据和答案
+4. 按份打乱单选题选项顺序并同步答案
+5. 根据种子记录重新生成历史试卷
+6. 加载mmap方式打开的编译题库(.qbank)
+7. 加载时一次性向量化清洗题库并生成校验报告
+8. 以不可变快照管理题库，重新加载时原子替换，生成中的试卷不受影响
+9. 按题目和选项文本检索题目，支持必选题和排除题
+10. 加载时汇总各题型题数和题号范围，界面刷新耗时与题库规模无关
+11. 以事件迭代器逐题产出试卷内容，预览和导出边生成边输出
 
 接口：
 - ExamCore: 核心业务逻辑类
-  - load_excel(file_path): 加载Excel文件
+  - load_excel(file_path, reader, build_search_index): 加载题库文件（Excel/CSV/TSV/JSONL）或编译题库(.qbank)
+  - validation_report: 最近一次加载发现的问题题目列表
+  - snapshot: 当前题库快照(BankSnapshot)
+  - compile_bank(output_path): 将已加载题库编译为.qbank
   - get_question_type_count(question_type): 获取指定题型数量
   - get_question_numbers(question_type): 获取指定题型题号列表
+  - get_type_summary(): 获取各题型题数和题号范围
   - generate_preview(config): 生成试卷预览内容
   - generate_exam_data(config): 生成试卷数据
+  - generate_exam_batch(config, exam_count, seed): 批量生成多份试卷数据
+  - iter_exam(config, seed): 逐步生成一份试卷的事件迭代器
+  - iter_exam_batch(config, exam_count, seed): 返回多份试卷的记录和事件迭代器
+  - stream_preview(config, seed): 返回(总题数, 预览文本片段迭代器)
+  - regenerate(record, file_path): 根据试卷记录重新生成试卷数据
+  - search(query, limit): 检索题目和选项文本
+  - search_ready: 检索索引是否已构建完成或构建失败
 
 依赖：
 - pandas
+- numpy
+- qbank
+- search_index
+- readers
 """
 
 import pandas as pd
 import random
 import numpy as np
-from collections import OrderedDict
+import hashlib
+import json
+import secrets
+import time
+import itertools
+from qbank import QBank, compile_bank
+from search_index import SearchIndex
+from readers import read_bank
+from collections import OrderedDict, namedtuple
+
+# 单选题选项字母
+OPTION_LETTERS = ['A', 'B', 'C', 'D', 'E']
+
+# 选项列名
+OPTION_COLUMNS = [f"选项{option}" for option in OPTION_LETTERS]
+
+# 判断题答案的规范写法
+JUDGMENT_ANSWERS = {'1': '√', '0': '×', '√': '√', '×': '×'}
+
+# 题库快照：加载完成后不再修改，重新加载时整体替换
+# version: 加载序号；data: 清洗后的DataFrame；path: 题库路径；bank_hash: 内容哈希
+# qbank: 编译题库（文本字段按需从mmap读取），Excel题库为None
+# validation_report: 校验报告，元素为{'题号', '题型', '问题'}
+# search_index: 题目检索索引(SearchIndex)
+# type_summary: 各题型校验通过题目的汇总，{题型: TypeSummary}
+BankSnapshot = namedtuple('BankSnapshot', ['version', 'data', 'path', 'bank_hash', 'qbank', 'validation_report',
+                                           'search_index', 'type_summary'])
+
+EMPTY_SNAPSHOT = BankSnapshot(0, None, "", "", None, (), None, {})
+
+# 题型汇总：题数、最小题号、最大题号
+TypeSummary = namedtuple('TypeSummary', ['count', 'first', 'last'])
+
+# 检索文本包含的字段
+SEARCH_FIELDS = ['题目'] + OPTION_COLUMNS
 
 class ExamCore:
     def __init__(self):
-        self.exam_data = None
-        self.excel_path = ""
+        # 所有读取都先取得当前快照的引用，之后只访问该快照；
+        # 重新加载只做一次属性赋值（原子操作），生成过程无需加锁
+        self._snapshot = EMPTY_SNAPSHOT
+        self._versions = itertools.count(1)
+    
+    @property
+    def snapshot(self):
+        """当前题库快照"""
+        return self._snapshot
     
-    def load_excel(self, file_path):
-        """加载Excel题库"""
+    @property
+    def exam_data(self):
+        return self._snapshot.data
+    
+    @property
+    def excel_path(self):
+        return self._snapshot.path
+    
+    @property
+    def bank_hash(self):
+        return self._snapshot.bank_hash
+    
+    @property
+    def qbank(self):
+        return self._snapshot.qbank
+    
+    @property
+    def validation_report(self):
+        return self._snapshot.validation_report
+    
+    def load_excel(self, file_path, reader=None, build_search_index=True):
+        """
+        加载题库
+        
+        reader指定读取后端（'xlsx'、'csv'、'tsv'、'jsonl'），默认按扩展名选择。
+        build_search_index为False时不预先构建检索索引（首次检索时再构建），
+        用于只生成试卷、不做检索的场合。
+        
+        加载后题库列均为清洗后的规范值：题目/选项为去除空白和[A]前缀的字符串
+        （空选项为缺失值），判断题答案统一为√/×，并附加选项位图、答案序号和
+        有效标记列。生成试卷时不再处理原始单元格。
+        
+        新题库完整构建后才替换当前快照，加载失败时保留原题库。
+        """
         if not file_path:
             raise ValueError("请先选择Excel题库文件！")
         
-        # 读取Excel文件
-        self.exam_data = pd.read_excel(file_path)
-        self.excel_path = file_path
+        # 编译题库：定长数组和文本堆均保留在mmap中
+        if file_path.lower().endswith('.qbank'):
+            qbank = QBank(file_path)
+            
+            # 检索索引在后台线程中构建，打开耗时仍与题库规模无关；
+            # 构建完成前检索会等待（search_ready为False时界面提示索引构建中）；
+            # 构建失败时search_ready为True，检索抛出构建错误
+            def search_texts():
+                return ["\n".join(qbank.text(field, i) for field in SEARCH_FIELDS) for i in range(qbank.count)]
+            
+            exam_data = qbank.to_frame()
+            search_index = SearchIndex(search_texts, qbank.count)
+            self._snapshot = BankSnapshot(
+                next(self._versions), exam_data, file_path, qbank.bank_hash, qbank,
+                tuple(qbank.header.get('validation_report', [])),
+                search_index, self._summarize_types(exam_data)
+            )
+            if build_search_index:
+                search_index.build_in_background()
+            return
         
-        # 添加题号列
-        self.exam_data['题号'] = range(1, len(self.exam_data) + 1)
+        # 读取题库文件
+        exam_data = read_bank(file_path, reader)
         
         # 检查必要的列是否存在
         required_columns = ['题型', '题目', '正确答案']
         for col in required_columns:
-            if col not in self.exam_data.columns:
-                raise ValueError(f"Excel文件中缺少必需的列: '{col}'")
+            if col not in exam_data.columns:
+                raise ValueError(f"题库文件中缺少必需的列: '{col}'")
+        
+        exam_data, validation_report = self._normalize_bank(exam_data)
+        bank_hash = self._hash_file(file_path)
+        
+        # 按列拼接检索文本，避免逐行apply
+        search_texts = exam_data[SEARCH_FIELDS[0]].fillna("")
+        for field in SEARCH_FIELDS[1:]:
+            search_texts = search_texts + "\n" + exam_data[field].fillna("")
+        search_texts = search_texts.tolist()
+        search_index = SearchIndex(lambda: search_texts, len(exam_data))
+        if build_search_index:
+            search_index.build()
+        
+        self._snapshot = BankSnapshot(
+            next(self._versions), exam_data, file_path, bank_hash, None, tuple(validation_report),
+            search_index, self._summarize_types(exam_data)
+        )
+    
+    def compile_bank(self, output_path):
+        """将已加载的题库编译为.qbank文件"""
+        bank = self._snapshot
+        if bank.data is None:
+            raise ValueError("请先加载题库！")
+        if bank.qbank is not None:
+            raise ValueError("当前题库已是编译题库！")
+        compile_bank(bank.data, bank.bank_hash, output_path, list(bank.validation_report))
     
     def get_question_type_count(self, question_type):
-        """获取指定题型数量"""
-        if self.exam_data is None:
-            return 0
-        return len(self.exam_data[self.exam_data['题型'] == question_type])
+        """获取指定题型数量（不含校验未通过的题目）"""
+        summary = self._snapshot.type_summary.get(question_type)
+        return summary.count if summary else 0
     
     def get_question_numbers(self, question_type):
-        """获取指定题型题号列表"""
-        if self.exam_data is None:
+        """获取指定题型题号列表（不含校验未通过的题目）"""
+        bank = self._snapshot
+        if bank.data is None:
             return []
-        return list(self.exam_data[self.exam_data['题型'] == question_type]['题号'])
+        return list(self._questions_of_type(bank, question_type)['题号'])
+    
+    def get_type_summary(self):
+        """获取各题型校验通过题目的汇总，返回{题型: TypeSummary(题数, 最小题号, 最大题号)}"""
+        return dict(self._snapshot.type_summary)
+    
+    def _summarize_types(self, exam_data):
+        """按题型汇总校验通过的题目（内部方法）"""
+        valid = exam_data[exam_data['有效']]
+        stats = valid.groupby(valid['题型'].astype(str))['题号'].agg(['count', 'min', 'max'])
+        return {
+            question_type: TypeSummary(int(row['count']), int(row['min']), int(row['max']))
+            for question_type, row in stats.iterrows()
+        }
+    
+    @property
+    def search_ready(self):
+        """当前题库的检索索引是否已构建完成或构建失败（检索不会阻塞，失败时search()抛出构建错误）"""
+        search_index = self._snapshot.search_index
+        return search_index is None or search_index.ready or search_index.error is not None
+    
+    def search(self, query, limit=100):
+        """
+        检索题目和选项文本中包含query的题目（不含校验未通过的题目）
+        
+        返回：
+        (结果列表, 是否还有更多结果)，结果元素为{'题号', '题型', '题目'}，按题号排序
+        """
+        bank = self._snapshot
+        if bank.data is None:
+            return [], False
+        
+        valid_rows = np.flatnonzero(bank.data['有效'].to_numpy())
+        rows, has_more = bank.search_index.search(query, limit, candidates=valid_rows)
+        results = []
+        for row in rows:
+            question = bank.data.iloc[row]
+            results.append({
+                '题号': int(question['题号']),
+                '题型': str(question['题型']),
+                '题目': self._question_text(bank, question),
+            })
+        return results, has_more
+    
+    def _questions_of_type(self, bank, question_type):
+        """返回快照中指定题型校验通过的题目（内部方法）"""
+        return bank.data[(bank.data['题型'] == question_type) & bank.data['有效']]
+    
+    def _normalize_bank(self, exam_data):
+        """
+        向量化清洗题库并校验（内部方法）
+        
+        返回(清洗后的DataFrame, 校验报告)。校验未通过的题目保留题号，
+        但'有效'列为False，不参与抽题。
+        """
+        count = len(exam_data)
+        data = pd.DataFrame(index=pd.RangeIndex(count))
+        data['题号'] = np.arange(1, count + 1)
+        data['题型'] = self._text_column(exam_data['题型']).str.strip().fillna('')
+        data['题目'] = self._text_column(exam_data['题目']).str.strip().fillna('')
+        
+        # 选项：转为字符串（数字选项不再因.strip()报错），去除[A]前缀，空白视为缺失
+        option_mask = np.zeros(count, dtype=np.uint8)
+        for i, option_col in enumerate(OPTION_COLUMNS):
+            if option_col in exam_data.columns:
+                values = self._text_column(exam_data[option_col]).str.strip()
+                values = values.str.replace(r'^\[[^\W\d_]\]', '', regex=True).str.strip()
+                values = values.mask(values == '')
+            else:
+                values = pd.Series(pd.NA, index=data.index, dtype='string')
+            data[option_col] = values
+            option_mask |= values.notna().to_numpy(dtype=np.uint8) << i
+        data['选项位图'] = option_mask
+        
+        # 答案：判断题统一为√/×，单选题计算答案对应的选项序号
+        answers = self._text_column(exam_data['正确答案']).str.strip().fillna('')
+        is_judgment = (data['题型'] == '判断题').to_numpy()
+        is_mcq = (data['题型'] == '单选题').to_numpy()
+        judgment_answers = answers.map(JUDGMENT_ANSWERS)
+        answers = answers.where(~is_judgment, judgment_answers.fillna(answers))
+        data['正确答案'] = answers
+        
+        answer_index = answers.map({letter: i for i, letter in enumerate(OPTION_LETTERS)}).fillna(-1).to_numpy(dtype=np.int8)
+        data['答案序号'] = answer_index
+        answer_present = (answer_index >= 0) & ((option_mask >> np.maximum(answer_index, 0)) & 1).astype(bool)
+        
+        # 校验
+        problems = [
+            (data['题目'].to_numpy() == '', "题目为空"),
+            (answers.to_numpy() == '', "正确答案为空"),
+            (is_judgment & judgment_answers.isna().to_numpy() & (answers.to_numpy() != ''), "判断题答案应为1/0或√/×"),
+            (is_mcq & (answer_index < 0) & (answers.to_numpy() != ''), "单选题答案应为A-E中的一个字母"),
+            (is_mcq & (answer_index >= 0) & ~answer_present, "单选题答案对应的选项为空"),
+        ]
+        invalid = np.zeros(count, dtype=bool)
+        report = []
+        for flags, message in problems:
+            invalid |= flags
+            for index in np.flatnonzero(flags):
+                report.append({'题号': int(index) + 1, '题型': data['题型'].iat[index], '问题': message})
+        report.sort(key=lambda item: item['题号'])
+        data['有效'] = ~invalid
+        
+        return data, report
+    
+    def _text_column(self, values):
+        """
+        将单元格列转换为字符串列（内部方法）
+        
+        整数值的浮点单元格（Excel中的5、含空行时被读成5.0）转换为"5"，
+        不带".0"；全为文本的列直接转换。整列向量化处理，不逐格调用Python函数。
+        """
+        inferred = pd.api.types.infer_dtype(values, skipna=True)
+        text = values.astype('string')
+        if inferred in ('string', 'empty'):
+            return text
+        
+        # 只有字符串形式含".0"的单元格可能是整数值的浮点数（整数和布尔
+        # 单元格本身不带"."），数值解析只在这些候选单元格上进行
+        candidates = text.str.contains('.0', regex=False).fillna(False).to_numpy()
+        if not candidates.any():
+            return text
+        cells = values[candidates]
+        numbers = pd.to_numeric(cells, errors='coerce')
+        integral = numbers % 1 == 0
+        # 文本单元格（如"5.0"）保留原样
+        cells_inferred = pd.api.types.infer_dtype(cells, skipna=True)
+        if cells_inferred == 'string':
+            return text
+        if cells_inferred in ('mixed', 'mixed-integer'):
+            integral &= cells.str.len().isna()
+        text[integral.index[integral]] = numbers[integral].astype('Int64').astype('string')
+        return text
     
     def generate_preview(self, config):
         """生成试卷预览内容"""
-        if self.exam_data is None:
-            raise ValueError("请先加载题库！")
+        total_count, chunks = self.stream_preview(config)
+        return "".join(chunks), total_count
+    
+    def stream_preview(self, config, seed=None):
+        """
+        逐段生成试卷预览
         
-        # 验证设置
-        if not (config['include_judgment'] or config['include_mcq']):
-            raise ValueError("请至少选择一种试题类型！")
+        抽题完成后立即返回(总题数, 预览文本片段迭代器)，题目文本在迭代时
+        逐题读取和渲染，首段输出的耗时与试卷长度无关。
+        """
+        events = self.iter_exam(config, seed)
+        _, exam = next(events)
+        return exam['total_count'], self._iter_preview(exam, events)
+    
+    def iter_exam(self, config, seed=None):
+        """
+        逐步生成一份试卷，返回事件迭代器，依次产出(事件类型, 内容)：
+        - ('exam', 试卷信息)：exam_title、student_name、include_answers、bank_hash、total_count、record
+        - ('section', 大题信息)：type、number、count
+        - ('question', 题目)：id、number、type、text、options、option_order、answer
+        - ('answer', (卷面题号, 答案))
         
-        # 生成试卷数据
-        exam_content, all_answers, total_count = self._generate_exam_content(config)
+        配置校验和抽题在调用时完成，迭代时才逐题读取文本。
+        """
+        _, streams = self.iter_exam_batch(config, 1, seed)
+        return streams[0]
+    
+    def iter_exam_batch(self, config, exam_count=1, seed=None):
+        """
+        返回(试卷记录列表, 事件迭代器列表)，每份试卷一个迭代器
         
-        # 添加答案部分
-        if config['include_answers'] and all_answers:
-            exam_content += "\n\n===== 参考答案 =====\n"
-            
-            # 按题号排序答案
-            all_answers.sort(key=lambda x: x[0])
-            answer_list = [ans[1] for ans in all_answers]
-            answer_str = self._format_answers(answer_list)
-            exam_content += f"全部答案: {answer_str}\n"
-            
-            # 按题型分组答案
-            exam_content += "\n按题型分组答案:\n"
-            judgment_answers = [ans[1] for ans in all_answers if ans[1] in ['√', '×']]
-            if judgment_answers:
-                exam_content += f"判断题答案: {self._format_answers(judgment_answers)}\n"
-            
-            mcq_answers = [ans[1] for ans in all_answers if ans[1] in ['A', 'B', 'C', 'D', 'E']]
-            if mcq_answers:
-                exam_content += f"单选题答案: {self._format_answers(mcq_answers)}\n"
+        与generate_exam_batch()使用相同的种子派生方式，同一种子生成的试卷相同。
+        整批试卷在调用时完成抽题和选项排列抽取（配置错误此时即抛出），
+        题目文本在迭代时才逐题读取，不同时保留整批试卷内容。
+        """
+        bank = self._snapshot
+        self._validate_config(bank, config)
+        
+        if seed is None:
+            seed = secrets.randbits(64)
         
-        return exam_content, total_count
+        variants = self._prepare_variants(bank, config, seed, 0, exam_count)
+        records = [self._make_record(bank, config, seed, variant, exam_count) for variant in range(exam_count)]
+        streams = [
+            self._iter_exam_content(bank, config, sections, orders, record)
+            for (sections, orders), record in zip(variants, records)
+        ]
+        return records, streams
     
     def generate_exam_data(self, config):
         """生成试卷数据用于导出Word"""
-        if self.exam_data is None:
+        return self.generate_exam_batch(config, 1)[0]
+    
+    def generate_exam_batch(self, config, exam_count=1, seed=None):
+        """
+        批量生成多份试卷数据
+        
+        每份试卷独立抽题；启用选项乱序时，整批试卷的选项排列
+        一次性以numpy数组抽取，答案字母按同一排列重新映射。
+        每份试卷数据带有'record'字段，可用于regenerate()重新生成。
+        整批试卷始终基于调用开始时的题库快照生成。
+        """
+        bank = self._snapshot
+        self._validate_config(bank, config)
+        
+        if seed is None:
+            seed = secrets.randbits(64)
+        
+        exams = self._generate_variants(bank, config, seed, 0, exam_count)
+        for variant, exam in enumerate(exams):
+            exam['record'] = self._make_record(bank, config, seed, variant, exam_count)
+        return exams
+    
+    def regenerate(self, record, file_path=None):
+        """
+        根据试卷记录重新生成试卷数据
+        
+        file_path为空且尚未加载题库时，使用记录中的题库路径。
+        当前题库内容哈希与记录不一致时拒绝生成。
+        """
+        if file_path or self._snapshot.data is None:
+            self.load_excel(file_path or record['bank_path'])
+        
+        bank = self._snapshot
+        if bank.bank_hash != record['bank_hash']:
+            raise ValueError(
+                f"题库内容已变更，无法重新生成试卷 {record['exam_id']}！\n"
+                f"记录哈希: {record['bank_hash'][:12]}，当前哈希: {bank.bank_hash[:12]}"
+            )
+        
+        config = record['config']
+        self._validate_config(bank, config)
+        exam = self._generate_variants(bank, config, record['seed'], record['variant'], 1)[0]
+        exam['record'] = record
+        return exam
+    
+    def _validate_config(self, bank, config):
+        """检查题库已加载且配置有效（内部方法）"""
+        if bank.data is None:
             raise ValueError("请先加载题库！")
         
         # 验证设置
         if not (config['include_judgment'] or config['include_mcq']):
             raise ValueError("请至少选择一种试题类型！")
+    
+    def _generate_variants(self, bank, config, seed, first_variant, count):
+        """
+        生成第first_variant份起的count份试卷（内部方法）
+        
+        每份试卷的抽题随机流由(种子, 份号)独立派生；选项排列来自同一
+        种子派生的批量随机流，可跳过前面各份直接定位，因此任意一份
+        都能单独重现。
+        """
+        return [
+            self._generate_exam_content(bank, config, sections, orders)
+            for sections, orders in self._prepare_variants(bank, config, seed, first_variant, count)
+        ]
+    
+    def _prepare_variants(self, bank, config, seed, first_variant, count):
+        """
+        为第first_variant份起的count份试卷抽题（内部方法）
+        
+        返回[(各大题抽中的题目, 选项排列)]；启用选项乱序时整批只抽取一次
+        排列数组，未启用时选项排列为None。
+        """
+        variants = range(first_variant, first_variant + count)
+        selections = [self._select_questions(bank, config, self._variant_rng(seed, v)) for v in variants]
         
-        # 生成试卷内容
-        _, all_answers, total_count = self._generate_exam_content(config)
+        if not config.get('shuffle_options'):
+            return [(sections, None) for sections in selections]
         
-        # 返回试卷数据
+        perm, inverse = self._draw_option_orders(bank, selections, self._option_rng(seed), first_variant)
+        return [(sections, (perm[i], inverse[i])) for i, sections in enumerate(selections)]
+    
+    def _variant_rng(self, seed, variant):
+        """第variant份试卷的抽题随机数生成器（内部方法）"""
+        return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(0, variant)))
+    
+    def _option_rng(self, seed):
+        """整批试卷共用的选项排列随机数生成器（内部方法）"""
+        return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(1,)))
+    
+    def _make_record(self, bank, config, seed, variant, exam_count):
+        """生成可重现该份试卷的紧凑记录（内部方法）"""
         return {
-            'exam_title': config['exam_title'],
-            'student_name': config['student_name'],
-            'include_answers': config['include_answers'],
-            'all_answers': all_answers,
-            'total_count': total_count
+            'exam_id': f"{seed:016x}-{variant + 1}",
+            'bank_hash': bank.bank_hash,
+            'bank_path': bank.path,
+            'config': self._normalize_config(config),
+            'seed': seed,
+            'variant': variant,
+            'exam_count': exam_count,
+            'created_at': time.strftime("%Y-%m-%d %H:%M:%S")
         }
     
-    def _generate_exam_content(self, config):
-        """生成试卷内容（内部方法）"""
-        preview_content = f"试卷标题: {config['exam_title']}\n"
-        preview_content += f"考生信息: {config['student_name']}\n\n"
+    def _normalize_config(self, config):
+        """将配置转换为键有序、值为JSON基本类型的字典（内部方法）"""
+        return json.loads(json.dumps(config, sort_keys=True, default=lambda value: value.item()))
+    
+    def _hash_file(self, file_path):
+        """计算题库文件内容的SHA-256哈希（内部方法）"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def _select_questions(self, bank, config, rng):
+        """
+        按配置抽取题目，返回[(题型, 已选题目DataFrame), ...]（内部方法）
         
-        # 用于收集答案（按全局题号）
-        all_answers = []
-        question_counter = 1  # 全局题号计数器
+        config['exclude_ids']中的题目不参与抽取；config['include_ids']中的题目
+        必定入选，计入该题型的题数，其余名额再从剩余题目中抽取。
+        """
+        sections = []
+        include_ids = config.get('include_ids') or []
+        exclude_ids = config.get('exclude_ids') or []
         
         # 根据导出模式处理题目
-        if config['export_mode'] == "随机抽取":
-            sections = []
-            if config['include_judgment']:
-                sections.append(('判断题', config['judgment_count']))
-            if config['include_mcq']:
-                sections.append(('单选题', config['mcq_count']))
-            
-            # 根据用户选择调整顺序
-            if config['type_order'] == "单选题→判断题" and len(sections) > 1:
-                sections.reverse()
-            
-            for section_type, section_count in sections:
-                if section_type == '判断题':
-                    # 判断题部分
-                    preview_content += f"{question_counter}. 判断题（每题1分，共{section_count}分）\n\n"
-                    judgment_questions = self.exam_data[self.exam_data["题型"] == "判断题"]
-                    
-                    if len(judgment_questions) < section_count:
-                        section_count = len(judgment_questions)
-                    
-                    # 抽取题目
-                    if config['random_order']:
-                        selected_judgment = judgment_questions.sample(section_count)
-                    else:
-                        selected_judgment = judgment_questions.head(section_count)
-                    
-                    # 添加题目
-                    for _, row in selected_judgment.iterrows():
-                        preview_content += f"{question_counter}. {row['题目']} __________\n"
-                        
-                        # 确保答案是字符串
-                        answer = str(row['正确答案']).strip()
-                        if answer == "1":
-                            answer = "√"
-                        elif answer == "0":
-                            answer = "×"
-                        all_answers.append((question_counter, answer))
-                        
-                        question_counter += 1
-                    
-                    preview_content += "\n"
-                
-                elif section_type == '单选题':
-                    # 单选题部分
-                    preview_content += f"{question_counter}. 单选题（每题1分，共{section_count}分）\n\n"
-                    mcq_questions = self.exam_data[self.exam_data["题型"] == "单选题"]
-                    
-                    if len(mcq_questions) < section_count:
-                        section_count = len(mcq_questions)
-                    
-                    # 抽取题目
-                    if config['random_order']:
-                        selected_mcq = mcq_questions.sample(section_count)
-                    else:
-                        selected_mcq = mcq_questions.head(section_count)
-                    
-                    # 添加题目
-                    for _, row in selected_mcq.iterrows():
-                        preview_content += f"{question_counter}. {row['题目']} [单选题]\n"
-                        
-                        # 添加选项
-                        options = []
-                        for option in ['A', 'B', 'C', 'D', 'E']:
-                            option_col = f"选项{option}"
-                            if option_col in row and pd.notna(row[option_col]) and row[option_col].strip():
-                                # 清理选项格式
-                                option_text = row[option_col].strip()
-                                if option_text.startswith('[') and option_text[1:2].isalpha() and option_text[2:3] == ']':
-                                    option_text = option_text[3:].strip()
-                                options.append(f"{option}. {option_text}")
-                        
-                        preview_content += "   " + "    ".join(options) + "\n\n"
-                        
-                        # 确保答案是字符串
-                        answer = str(row['正确答案']).strip()
-                        all_answers.append((question_counter, answer))
-                        question_counter += 1
-        
-        elif config['export_mode'] == "按比例导出":
-            # 获取总题数
-            total_count = config['total_questions']
-            
-            # 计算各题型数量
-            judgment_count = max(1, int(total_count * config['judgment_ratio'] / 100))
-            mcq_count = total_count - judgment_count
+        if config['export_mode'] in ("随机抽取", "按比例导出"):
+            if config['export_mode'] == "随机抽取":
+                judgment_count = config['judgment_count']
+                mcq_count = config['mcq_count']
+            else:
+                # 按总题数和比例计算各题型数量
+                total_count = config['total_questions']
+                judgment_count = max(1, int(total_count * config['judgment_ratio'] / 100))
+                mcq_count = total_count - judgment_count
             
-            sections = []
+            counts = []
             if config['include_judgment']:
-                sections.append(('判断题', judgment_count))
+                counts.append(('判断题', judgment_count))
             if config['include_mcq']:
-                sections.append(('单选题', mcq_count))
+                counts.append(('单选题', mcq_count))
             
-            # 根据用户选择调整顺序
-            if config['type_order'] == "单选题→判断题" and len(sections) > 1:
-                sections.reverse()
-            
-            for section_type, section_count in sections:
-                if section_type == '判断题':
-                    # 判断题部分
-                    preview_content += f"{question_counter}. 判断题（每题1分，共{section_count}分）\n\n"
-                    judgment_questions = self.exam_data[self.exam_data["题型"] == "判断题"]
-                    
-                    if len(judgment_questions) < section_count:
-                        section_count = len(judgment_questions)
-                    
-                    # 抽取题目
-                    if config['random_order']:
-                        selected_judgment = judgment_questions.sample(section_count)
-                    else:
-                        selected_judgment = judgment_questions.head(section_count)
-                    
-                    # 添加题目
-                    for _, row in selected_judgment.iterrows():
-                        preview_content += f"{question_counter}. {row['题目']} __________\n"
-                        
-                        # 确保答案是字符串
-                        answer = str(row['正确答案']).strip()
-                        if answer == "1":
-                            answer = "√"
-                        elif answer == "0":
-                            answer = "×"
-                        all_answers.append((question_counter, answer))
-                        
-                        question_counter += 1
-                    
-                    preview_content += "\n"
+            for section_type, section_count in counts:
+                questions = self._candidate_questions(bank, section_type, exclude_ids)
+                section_count = min(section_count, len(questions))
                 
-                elif section_type == '单选题':
-                    # 单选题部分
-                    preview_content += f"{question_counter}. 单选题（每题1分，共{section_count}分）\n\n"
-                    mcq_questions = self.exam_data[self.exam_data["题型"] == "单选题"]
-                    
-                    if len(mcq_questions) < section_count:
-                        section_count = len(mcq_questions)
-                    
-                    # 抽取题目
+                pinned_mask = questions['题号'].isin(include_ids)
+                if pinned_mask.any():
+                    # 必选题先入选，剩余名额从其他题目中抽取
+                    pinned = questions[pinned_mask]
+                    others = questions[~pinned_mask]
+                    rest = max(0, section_count - len(pinned))
                     if config['random_order']:
-                        selected_mcq = mcq_questions.sample(section_count)
+                        selected = pd.concat([pinned, others.sample(rest, random_state=rng)])
+                        selected = selected.sample(frac=1, random_state=rng)
                     else:
-                        selected_mcq = mcq_questions.head(section_count)
-                    
-                    # 添加题目
-                    for _, row in selected_mcq.iterrows():
-                        preview_content += f"{question_counter}. {row['题目']} [单选题]\n"
-                        
-                        # 添加选项
-                        options = []
-                        for option in ['A', 'B', 'C', 'D', 'E']:
-                            option_col = f"选项{option}"
-                            if option_col in row and pd.notna(row[option_col]) and row[option_col].strip():
-                                # 清理选项格式
-                                option_text = row[option_col].strip()
-                                if option_text.startswith('[') and option_text[1:2].isalpha() and option_text[2:3] == ']':
-                                    option_text = option_text[3:].strip()
-                                options.append(f"{option}. {option_text}")
-                        
-                        preview_content += "   " + "    ".join(options) + "\n\n"
-                        
-                        # 确保答案是字符串
-                        answer = str(row['正确答案']).strip()
-                        all_answers.append((question_counter, answer))
-                        question_counter += 1
+                        selected = pd.concat([pinned, others.head(rest)]).sort_values('题号')
+                # 抽取题目
+                elif config['random_order']:
+                    selected = questions.sample(section_count, random_state=rng)
+                else:
+                    selected = questions.head(section_count)
+                sections.append((section_type, selected))
         
         elif config['export_mode'] == "顺序导出":
-            # 获取题目范围
-            judgment_start = config['judgment_start']
-            judgment_end = config['judgment_end']
-            mcq_start = config['mcq_start']
-            mcq_end = config['mcq_end']
-            
             # 验证范围
-            if config['include_judgment'] and judgment_start > judgment_end:
+            if config['include_judgment'] and config['judgment_start'] > config['judgment_end']:
                 raise ValueError("判断题起始题号不能大于结束题号！")
             
-            if config['include_mcq'] and mcq_start > mcq_end:
+            if config['include_mcq'] and config['mcq_start'] > config['mcq_end']:
                 raise ValueError("单选题起始题号不能大于结束题号！")
             
-            sections = []
+            ranges = []
             if config['include_judgment']:
-                judgment_count = judgment_end - judgment_start + 1
-                sections.append(('判断题', judgment_count, judgment_start, judgment_end))
-            
+                ranges.append(('判断题', config['judgment_start'], config['judgment_end']))
             if config['include_mcq']:
-                mcq_count = mcq_end - mcq_start + 1
-                sections.append(('单选题', mcq_count, mcq_start, mcq_end))
+                ranges.append(('单选题', config['mcq_start'], config['mcq_end']))
             
-            # 根据用户选择调整顺序
-            if config['type_order'] == "单选题→判断题" and len(sections) > 1:
-                sections.reverse()
+            for section_type, start_num, end_num in ranges:
+                questions = self._candidate_questions(bank, section_type, exclude_ids)
+                in_range = (questions['题号'] >= start_num) & (questions['题号'] <= end_num)
+                selected = questions[in_range | questions['题号'].isin(include_ids)]
+                
+                # 按题号排序
+                sections.append((section_type, selected.sort_values('题号')))
+        
+        # 根据用户选择调整顺序
+        if config['type_order'] == "单选题→判断题" and len(sections) > 1:
+            sections.reverse()
+        
+        return sections
+    
+    def _candidate_questions(self, bank, question_type, exclude_ids):
+        """返回指定题型可抽取的题目，去除排除题（内部方法）"""
+        questions = self._questions_of_type(bank, question_type)
+        if exclude_ids:
+            questions = questions[~questions['题号'].isin(exclude_ids)]
+        return questions
+    
+    def _draw_option_orders(self, bank, selections, rng, first_variant=0):
+        """
+        为整批试卷一次性抽取选项排列（内部方法）
+        
+        返回(排列, 逆排列)两个形状为(份数, 每份题数, 5)的数组：
+        排列[v, q, j]为第v份第q题新位置j对应的原选项下标，
+        逆排列[v, q, i]为原选项i的新位置。空选项始终排在末尾。
+        first_variant > 0 时先跳过前面各份占用的随机数。
+        """
+        # 题库级选项掩码只计算一次，再按各份试卷所选题号整体索引
+        bank_mask = self._option_mask(bank.data)
+        positions = np.array([
+            np.concatenate([selected['题号'].to_numpy() - 1 for _, selected in sections])
+            for sections in selections
+        ], dtype=np.int64)
+        present = bank_mask[positions]
+        
+        # 每个随机浮点数消耗一步PCG64状态
+        if first_variant:
+            rng.bit_generator.advance(first_variant * present.shape[1] * present.shape[2])
+        keys = rng.random(present.shape)
+        keys[~present] = 2.0
+        perm = np.argsort(keys, axis=2, kind='stable')
+        inverse = np.argsort(perm, axis=2, kind='stable')
+        return perm, inverse
+    
+    def _option_mask(self, selected):
+        """返回形状为(题数, 5)的布尔数组，标记各题选项是否非空（内部方法）"""
+        bits = selected['选项位图'].to_numpy()
+        return ((bits[:, None] >> np.arange(len(OPTION_LETTERS))) & 1).astype(bool)
+    
+    def _question_text(self, bank, row):
+        """返回题目文本（内部方法）"""
+        if bank.qbank is not None:
+            return bank.qbank.text('题目', row.name)
+        return row['题目']
+    
+    def _option_texts(self, bank, row):
+        """返回已清洗的选项文本列表，空选项为None（内部方法）"""
+        texts = []
+        for i, option_col in enumerate(OPTION_COLUMNS):
+            if not (row['选项位图'] >> i) & 1:
+                texts.append(None)
+            elif bank.qbank is not None:
+                texts.append(bank.qbank.text(option_col, row.name))
+            else:
+                texts.append(row[option_col])
+        return texts
+    
+    def _generate_exam_content(self, bank, config, sections, option_orders=None):
+        """
+        根据已抽取的题目生成一份试卷数据（内部方法）
+        
+        option_orders: 本份试卷的(排列, 逆排列)数组，None表示保持原选项顺序
+        """
+        exam = None
+        for kind, payload in self._iter_exam_content(bank, config, sections, option_orders):
+            if kind == 'exam':
+                exam = dict(payload, sections=[], all_answers=[])
+                del exam['record']
+            elif kind == 'section':
+                exam['sections'].append(dict(payload, questions=[]))
+            elif kind == 'question':
+                exam['sections'][-1]['questions'].append(payload)
+            elif kind == 'answer':
+                exam['all_answers'].append(payload)
+        return exam
+    
+    def _iter_exam_content(self, bank, config, sections, option_orders=None, record=None):
+        """按题产出一份试卷的事件，事件格式见iter_exam()（内部方法）"""
+        yield ('exam', {
+            'exam_title': config['exam_title'],
+            'student_name': config['student_name'],
+            'include_answers': config['include_answers'],
+            'bank_hash': bank.bank_hash,
+            'total_count': sum(len(selected) for _, selected in sections),
+            'record': record,
+        })
+        
+        question_counter = 1  # 全局题号计数器
+        position = 0  # 题目在本份试卷中的位置，用于索引选项排列
+        
+        for section_type, selected in sections:
+            yield ('section', {
+                'type': section_type,
+                'number': question_counter,
+                'count': len(selected),
+            })
             
-            for section in sections:
-                section_type = section[0]
-                section_count = section[1]
-                start_num = section[2]
-                end_num = section[3]
+            for _, row in selected.iterrows():
+                # 答案在加载时已规范化
+                answer = row['正确答案']
+                options = []
+                option_order = ()  # 各选项对应的原选项下标
                 
-                if section_type == '判断题':
-                    # 判断题部分
-                    preview_content += f"{question_counter}. 判断题（每题1分，共{section_count}分）\n\n"
-                    judgment_questions = self.exam_data[
-                        (self.exam_data["题型"] == "判断题") & 
-                        (self.exam_data['题号'] >= start_num) & 
-                        (self.exam_data['题号'] <= end_num)
-                    ]
-                    
-                    # 按题号排序
-                    judgment_questions = judgment_questions.sort_values('题号')
-                    
-                    for _, row in judgment_questions.iterrows():
-                        preview_content += f"{question_counter}. {row['题目']} __________\n"
-                        
-                        # 确保答案是字符串
-                        answer = str(row['正确答案']).strip()
-                        if answer == "1":
-                            answer = "√"
-                        elif answer == "0":
-                            answer = "×"
-                        all_answers.append((question_counter, answer))
-                        
-                        question_counter += 1
-                    
-                    preview_content += "\n"
+                if section_type == '单选题':
+                    texts = self._option_texts(bank, row)
+                    if option_orders is None:
+                        # 不乱序时保留原选项字母，空选项跳过但不改变后续字母
+                        option_order = tuple(i for i, text in enumerate(texts) if text is not None)
+                        options = [(OPTION_LETTERS[i], texts[i]) for i in option_order]
+                    else:
+                        # 空选项排在排列末尾，有效选项按新位置依次编号
+                        perm, inverse = option_orders
+                        option_order = tuple(int(i) for i in perm[position] if texts[i] is not None)
+                        answer = OPTION_LETTERS[inverse[position][row['答案序号']]]
+                        options = [(OPTION_LETTERS[j], texts[i]) for j, i in enumerate(option_order)]
                 
-                elif section_type == '单选题':
-                    # 单选题部分
-                    preview_content += f"{question_counter}. 单选题（每题1分，共{section_count}分）\n\n"
-                    mcq_questions = self.exam_data[
-                        (self.exam_data["题型"] == "单选题") & 
-                        (self.exam_data['题号'] >= start_num) & 
-                        (self.exam_data['题号'] <= end_num)
-                    ]
-                    
-                    # 按题号排序
-                    mcq_questions = mcq_questions.sort_values('题号')
-                    
-                    for _, row in mcq_questions.iterrows():
-                        preview_content += f"{question_counter}. {row['题目']} [单选题]\n"
-                        
-                        # 添加选项
-                        options = []
-                        for option in ['A', 'B', 'C', 'D', 'E']:
-                            option_col = f"选项{option}"
-                            if option_col in row and pd.notna(row[option_col]) and row[option_col].strip():
-                                # 清理选项格式
-                                option_text = row[option_col].strip()
-                                if option_text.startswith('[') and option_text[1:2].isalpha() and option_text[2:3] == ']':
-                                    option_text = option_text[3:].strip()
-                                options.append(f"{option}. {option_text}")
-                        
-                        preview_content += "   " + "    ".join(options) + "\n\n"
-                        
-                        # 确保答案是字符串
-                        answer = str(row['正确答案']).strip()
-                        all_answers.append((question_counter, answer))
-                        question_counter += 1
-        
-        return preview_content, all_answers, question_counter - 1
+                yield ('question', {
+                    'id': int(row['题号']),
+                    'number': question_counter,
+                    'type': section_type,
+                    'text': self._question_text(bank, row),
+                    'options': options,
+                    'option_order': option_order,
+                    'answer': answer
+                })
+                yield ('answer', (question_counter, answer))
+                question_counter += 1
+                position += 1
+    
+    def _iter_preview(self, exam, events):
+        """将试卷事件逐段渲染为预览文本（内部方法）"""
+        yield f"试卷标题: {exam['exam_title']}\n"
+        yield f"考生信息: {exam['student_name']}\n\n"
+        
+        section_type = None
+        answers = []
+        for kind, payload in events:
+            if kind == 'section':
+                if section_type == '判断题':
+                    yield "\n"
+                section_type = payload['type']
+                yield f"{payload['number']}. {payload['type']}（每题1分，共{payload['count']}分）\n\n"
+            elif kind == 'question':
+                if section_type == '判断题':
+                    yield f"{payload['number']}. {payload['text']} __________\n"
+                else:
+                    options = [f"{letter}. {text}" for letter, text in payload['options']]
+                    yield f"{payload['number']}. {payload['text']} [单选题]\n   " + "    ".join(options) + "\n\n"
+            elif kind == 'answer':
+                answers.append(payload[1])
+        if section_type == '判断题':
+            yield "\n"
+        
+        # 添加答案部分（答案按卷面题号顺序产出）
+        if exam['include_answers'] and answers:
+            yield "\n\n===== 参考答案 =====\n"
+            yield f"全部答案: {self._format_answers(answers)}\n"
+            
+            # 按题型分组答案
+            yield "\n按题型分组答案:\n"
+            judgment_answers = [answer for answer in answers if answer in ['√', '×']]
+            if judgment_answers:
+                yield f"判断题答案: {self._format_answers(judgment_answers)}\n"
+            
+            mcq_answers = [answer for answer in answers if answer in OPTION_LETTERS]
+            if mcq_answers:
+                yield f"单选题答案: {self._format_answers(mcq_answers)}\n"
     
     def _format_answers(self, answers):
         """格式化答案字符串为1-5:ABCDA格式"""
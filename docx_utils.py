@@ -5,9 +5,14 @@
 1. 创建和格式化Word文档
 2. 添加试卷内容到Word文档
 3. 导出试卷到Word文件
+4. 批量导出时复用基础文档和题目段落片段
+5. 直接消费ExamCore.iter_exam()的事件流，逐题写入文档
 
 接口：
 - export_to_word(exam_data, config, exam_count=1): 导出试卷到Word文件
+- build_exam_document(exam_data, exam_num=1, exam_count=1): 创建单份试卷文档
+- ExamDocumentBuilder(cache_size): 批量创建试卷文档的构建器
+  - build(exam, exam_num, exam_count): 由试卷数据字典或事件迭代器创建单份试卷文档
 
 依赖：
 - python-docx
@@ -17,81 +22,40 @@ from docx import Document
 from docx.shared import Pt, Inches
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 from docx.oxml.ns import qn
+from collections import OrderedDict
+import copy
 import os
 from tkinter import filedialog
 
+# 题目段落片段缓存的最大条目数
+FRAGMENT_CACHE_SIZE = 4096
+
 def export_to_word(exam_data, config, exam_count=1):
     """
     导出试卷到Word文件
     
     参数：
-    exam_data: 试卷数据字典
+    exam_data: 试卷数据字典，或每份试卷各一项的列表（试卷数据字典或
+               ExamCore.iter_exam_batch()返回的事件迭代器，逐份生成并写入）
     config: 用户配置字典
     exam_count: 生成试卷份数
+    
+    返回：
+    已保存的文件路径列表
     """
-    # 生成多份试卷
+    # 每份试卷使用各自的数据（单个字典时各份共用）
+    if isinstance(exam_data, list):
+        exams = exam_data
+        exam_count = len(exams)
+    else:
+        exams = [exam_data] * exam_count
+    
+    # 生成多份试卷，同一批共用基础文档和题目片段缓存
+    builder = ExamDocumentBuilder()
     output_path = ""
-    for exam_num in range(1, exam_count + 1):
-        # 创建Word文档
-        doc = Document()
-        
-        # 设置中文字体
-        doc.styles['Normal'].font.name = u'宋体'
-        doc.styles['Normal']._element.rPr.rFonts.set(qn('w:eastAsia'), u'宋体')
-        doc.styles['Normal'].font.size = Pt(10.5)
-        
-        # 添加标题
-        title_text = f"{exam_data['exam_title']} (试卷{exam_num})" if exam_count > 1 else exam_data['exam_title']
-        title = doc.add_heading(title_text, level=0)
-        title.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-        title_run = title.runs[0]
-        title_run.font.size = Pt(16)
-        title_run.font.bold = True
-        
-        # 添加考生信息
-        info_para = doc.add_paragraph()
-        info_para.add_run(exam_data['student_name'])
-        info_para.alignment = WD_PARAGRAPH_ALIGNMENT.RIGHT
-        
-        doc.add_paragraph()
-        
-        # TODO: 这里需要添加试卷内容生成逻辑
-        # 由于内容较长，实际实现需要根据exam_data生成试卷内容
-        
-        # 添加分页符
-        doc.add_page_break()
-        
-        # 添加答案页（如果需要）
-        if exam_data['include_answers'] and exam_data['all_answers']:
-            answer_heading = doc.add_heading("参考答案", level=1)
-            answer_heading.runs[0].font.size = Pt(14)
-            
-            # 按题号排序答案
-            all_answers = sorted(exam_data['all_answers'], key=lambda x: x[0])
-            
-            # 添加全部答案
-            p_all = doc.add_paragraph()
-            p_all.add_run("全部答案: ")
-            
-            # 提取答案字符串
-            answer_list = [ans[1] for ans in all_answers]
-            p_all.add_run(_format_answers(answer_list))
-            p_all.paragraph_format.space_after = Pt(12)
-            
-            # 按题型分组答案
-            judgment_answers = [ans[1] for ans in all_answers if ans[1] in ['√', '×']]
-            if judgment_answers:
-                p_judgment = doc.add_paragraph()
-                p_judgment.add_run("判断题答案: ")
-                p_judgment.add_run(_format_answers(judgment_answers))
-                p_judgment.paragraph_format.space_after = Pt(12)
-            
-            mcq_answers = [ans[1] for ans in all_answers if ans[1] in ['A', 'B', 'C', 'D', 'E']]
-            if mcq_answers:
-                p_mcq = doc.add_paragraph()
-                p_mcq.add_run("单选题答案: ")
-                p_mcq.add_run(_format_answers(mcq_answers))
-                p_mcq.paragraph_format.space_after = Pt(12)
+    saved_paths = []
+    for exam_num, exam_data in enumerate(exams, start=1):
+        doc = builder.build(exam_data, exam_num, exam_count)
         
         # 保存文档
         if exam_count > 1 or exam_num == 1:
@@ -102,9 +66,206 @@ def export_to_word(exam_data, config, exam_count=1):
             )
         
         if not output_path:
-            return
+            return saved_paths
         
         doc.save(output_path)
+        saved_paths.append(output_path)
+    
+    return saved_paths
+
+def build_exam_document(exam_data, exam_num=1, exam_count=1):
+    """
+    创建一份试卷的Word文档
+    
+    参数：
+    exam_data: 试卷数据字典
+    exam_num: 试卷序号（从1开始）
+    exam_count: 同批试卷份数，大于1时标题带序号
+    """
+    return ExamDocumentBuilder().build(exam_data, exam_num, exam_count)
+
+class ExamDocumentBuilder:
+    """
+    批量创建试卷文档的构建器
+    
+    基础文档（宋体Normal样式、标题、考生信息）每批只创建一次，每份试卷深拷贝；
+    每道题渲染后的段落XML按(题库哈希, 题号, 题型, 选项顺序)缓存（LRU），
+    其他试卷再次抽到同一题时直接复制片段，只替换卷面题号。
+    """
+    
+    def __init__(self, cache_size=FRAGMENT_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._base = None
+        self._scratch = None  # 渲染题目片段用的草稿文档
+        self._fragments = OrderedDict()
+    
+    def build(self, exam, exam_num=1, exam_count=1):
+        """
+        创建一份试卷的Word文档
+        
+        exam: 试卷数据字典，或ExamCore.iter_exam()返回的事件迭代器；
+              事件迭代器边生成边写入，不保留整份试卷数据
+        """
+        if self._base is None:
+            self._base = _create_base_document()
+        
+        # 深拷贝整个包后重新取文档对象；直接深拷贝Document会使其与文档部件各持一份XML
+        doc = copy.deepcopy(self._base.part.package).main_document_part.document
+        body = doc.element.body
+        sect_pr = body.find(qn('w:sectPr'))
+        
+        events = _exam_events(exam) if isinstance(exam, dict) else exam
+        info = {}
+        section_type = None
+        answers = []
+        for kind, payload in events:
+            if kind == 'exam':
+                # 填写标题和考生信息
+                info = payload
+                title_text = f"{info['exam_title']} (试卷{exam_num})" if exam_count > 1 else info['exam_title']
+                doc.paragraphs[0].runs[0].text = title_text
+                doc.paragraphs[1].runs[0].text = info['student_name']
+            elif kind == 'section':
+                section_type = payload['type']
+                header = doc.add_paragraph()
+                header_run = header.add_run(f"{payload['number']}. {payload['type']}（每题1分，共{payload['count']}分）")
+                header_run.font.bold = True
+            elif kind == 'question':
+                fragment = self._question_fragment(info.get('bank_hash'), section_type, payload)
+                elements = [copy.deepcopy(element) for element in fragment]
+                
+                # 片段中的卷面题号是占位符，替换为本份试卷的题号
+                elements[0].find(qn('w:r')).find(qn('w:t')).text = f"{payload['number']}. "
+                for element in elements:
+                    if sect_pr is not None:
+                        sect_pr.addprevious(element)
+                    else:
+                        body.append(element)
+            elif kind == 'answer':
+                answers.append(payload)
+        
+        # 添加分页符
+        doc.add_page_break()
+        
+        if info.get('include_answers'):
+            _add_answer_page(doc, answers)
+        return doc
+    
+    def _question_fragment(self, bank_hash, section_type, question):
+        """返回题目的段落XML片段（带LRU缓存）"""
+        # 题库哈希+题号+选项顺序+选项字母即可确定内容，不再对题目和选项全文求哈希
+        # （不乱序时保留原字母，同一选项顺序乱序与否字母可能不同）；
+        # 手工构造、没有题号或选项顺序的题目退回按文本缓存
+        if question.get('id') is not None and 'option_order' in question:
+            letters = ''.join(letter for letter, _ in question['options'])
+            key = (bank_hash, question['id'], section_type, tuple(question['option_order']), letters)
+        else:
+            key = (bank_hash, None, section_type, question['text'], tuple(question['options']))
+        fragment = self._fragments.get(key)
+        if fragment is not None:
+            self._fragments.move_to_end(key)
+            self.cache_hits += 1
+            return fragment
+        
+        self.cache_misses += 1
+        if self._scratch is None:
+            self._scratch = Document()
+        
+        paragraphs = []
+        if section_type == '判断题':
+            p = self._scratch.add_paragraph()
+            p.add_run("0. ")
+            p.add_run(f"{question['text']} __________")
+            paragraphs.append(p)
+        else:
+            p = self._scratch.add_paragraph()
+            p.add_run("0. ")
+            p.add_run(f"{question['text']}")
+            paragraphs.append(p)
+            options = [f"{letter}. {text}" for letter, text in question['options']]
+            options_para = self._scratch.add_paragraph("    ".join(options))
+            options_para.paragraph_format.left_indent = Inches(0.3)
+            paragraphs.append(options_para)
+        
+        fragment = []
+        for p in paragraphs:
+            p._p.getparent().remove(p._p)
+            fragment.append(p._p)
+        
+        self._fragments[key] = fragment
+        if len(self._fragments) > self.cache_size:
+            self._fragments.popitem(last=False)
+        return fragment
+
+def _create_base_document():
+    """创建带样式、标题和考生信息占位的基础文档（内部函数）"""
+    # 创建Word文档
+    doc = Document()
+    
+    # 设置中文字体
+    doc.styles['Normal'].font.name = u'宋体'
+    doc.styles['Normal']._element.rPr.rFonts.set(qn('w:eastAsia'), u'宋体')
+    doc.styles['Normal'].font.size = Pt(10.5)
+    
+    # 添加标题
+    title = doc.add_heading(" ", level=0)
+    title.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    title_run = title.runs[0]
+    title_run.font.size = Pt(16)
+    title_run.font.bold = True
+    
+    # 添加考生信息
+    info_para = doc.add_paragraph()
+    info_para.add_run(" ")
+    info_para.alignment = WD_PARAGRAPH_ALIGNMENT.RIGHT
+    
+    doc.add_paragraph()
+    return doc
+
+def _exam_events(exam_data):
+    """将试卷数据字典转换为与ExamCore.iter_exam()相同的事件序列（内部函数）"""
+    yield ('exam', exam_data)
+    for section in exam_data.get('sections', []):
+        yield ('section', section)
+        for question in section['questions']:
+            yield ('question', question)
+    for answer in exam_data['all_answers']:
+        yield ('answer', answer)
+
+def _add_answer_page(doc, all_answers):
+    """添加答案页，all_answers为[(卷面题号, 答案), ...]（内部函数）"""
+    if all_answers:
+        answer_heading = doc.add_heading("参考答案", level=1)
+        answer_heading.runs[0].font.size = Pt(14)
+        
+        # 按题号排序答案
+        all_answers = sorted(all_answers, key=lambda x: x[0])
+        
+        # 添加全部答案
+        p_all = doc.add_paragraph()
+        p_all.add_run("全部答案: ")
+        
+        # 提取答案字符串
+        answer_list = [ans[1] for ans in all_answers]
+        p_all.add_run(_format_answers(answer_list))
+        p_all.paragraph_format.space_after = Pt(12)
+        
+        # 按题型分组答案
+        judgment_answers = [ans[1] for ans in all_answers if ans[1] in ['√', '×']]
+        if judgment_answers:
+            p_judgment = doc.add_paragraph()
+            p_judgment.add_run("判断题答案: ")
+            p_judgment.add_run(_format_answers(judgment_answers))
+            p_judgment.paragraph_format.space_after = Pt(12)
+        
+        mcq_answers = [ans[1] for ans in all_answers if ans[1] in ['A', 'B', 'C', 'D', 'E']]
+        if mcq_answers:
+            p_mcq = doc.add_paragraph()
+            p_mcq.add_run("单选题答案: ")
+            p_mcq.add_run(_format_answers(mcq_answers))
+            p_mcq.paragraph_format.space_after = Pt(12)
 
 def _format_answers(answers):
     """格式化答案字符串为1-5:ABCDA格式（内部函数）"""
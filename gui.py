@@ -6,6 +6,8 @@
 2. 处理用户交互事件
 3. 调用核心业务逻辑
 4. 显示预览和状态信息
+5. 检索题目，设置必选题和排除题
+6. 题数和题号范围使用带范围校验的数值输入框，并显示各题型题数分布
 
 接口：
 - ExamGeneratorGUI(root): 主GUI类
@@ -13,10 +15,13 @@
   - load_excel(): 加载Excel题库
   - generate_preview(): 生成试卷预览
   - export_word(): 导出Word文档
+  - get_config(): 收集用户设置
+  - search_questions(): 检索题目
 
 依赖：
 - core.ExamCore
 - docx_utils
+- records
 - config
 """
 
@@ -25,7 +30,9 @@ from tkinter import ttk, filedialog, messagebox, scrolledtext
 import os
 from core import ExamCore
 from docx_utils import export_to_word
-from config import DEFAULT_EXAM_TITLE, DEFAULT_STUDENT_INFO
+from records import append_records
+from config import (DEFAULT_EXAM_TITLE, DEFAULT_STUDENT_INFO, SEARCH_DELAY_MS, SEARCH_RESULT_LIMIT, SUMMARY_BAR_WIDTH,
+                    PREVIEW_REFRESH_CHUNKS)
 
 class ExamGeneratorGUI:
     def __init__(self, root):
@@ -110,17 +117,17 @@ class ExamGeneratorGUI:
         self.sequential_frame.grid(row=4, column=0, columnspan=3, sticky=tk.W, pady=5)
         
         tk.Label(self.sequential_frame, text="判断题范围:", bg="#f0f8ff", font=("微软雅黑", 9)).grid(row=0, column=0, sticky=tk.W)
-        self.judgment_start = ttk.Combobox(self.sequential_frame, values=[], width=5)
+        self.judgment_start = self._number_input(self.sequential_frame)
         self.judgment_start.grid(row=0, column=1, sticky=tk.W, padx=(0, 5))
         tk.Label(self.sequential_frame, text="-", bg="#f0f8ff").grid(row=0, column=2)
-        self.judgment_end = ttk.Combobox(self.sequential_frame, values=[], width=5)
+        self.judgment_end = self._number_input(self.sequential_frame)
         self.judgment_end.grid(row=0, column=3, sticky=tk.W, padx=(5, 10))
         
         tk.Label(self.sequential_frame, text="单选题范围:", bg="#f0f8ff", font=("微软雅黑", 9)).grid(row=0, column=4, sticky=tk.W)
-        self.mcq_start = ttk.Combobox(self.sequential_frame, values=[], width=5)
+        self.mcq_start = self._number_input(self.sequential_frame)
         self.mcq_start.grid(row=0, column=5, sticky=tk.W, padx=(0, 5))
         tk.Label(self.sequential_frame, text="-", bg="#f0f8ff").grid(row=0, column=6)
-        self.mcq_end = ttk.Combobox(self.sequential_frame, values=[], width=5)
+        self.mcq_end = self._number_input(self.sequential_frame)
         self.mcq_end.grid(row=0, column=7, sticky=tk.W)
         
         # 默认隐藏设置
@@ -142,7 +149,7 @@ class ExamGeneratorGUI:
                       bg="#f0f8ff", font=("微软雅黑", 9)).grid(row=7, column=0, sticky=tk.W)
         
         tk.Label(left_frame, text="数量:", bg="#f0f8ff", font=("微软雅黑", 9)).grid(row=7, column=1, sticky=tk.W)
-        self.judgment_count = ttk.Combobox(left_frame, values=[], width=5)
+        self.judgment_count = self._number_input(left_frame)
         self.judgment_count.grid(row=7, column=2, sticky=tk.W)
         
         # 单选题
@@ -151,7 +158,7 @@ class ExamGeneratorGUI:
                       bg="#f0f8ff", font=("微软雅黑", 9)).grid(row=8, column=0, sticky=tk.W, pady=5)
         
         tk.Label(left_frame, text="数量:", bg="#f0f8ff", font=("微软雅黑", 9)).grid(row=8, column=1, sticky=tk.W)
-        self.mcq_count = ttk.Combobox(left_frame, values=[], width=5)
+        self.mcq_count = self._number_input(left_frame)
         self.mcq_count.grid(row=8, column=2, sticky=tk.W)
         
         # 答案选项
@@ -164,16 +171,59 @@ class ExamGeneratorGUI:
         tk.Checkbutton(left_frame, text="随机排序题目", variable=self.random_order_var, 
                       bg="#f0f8ff", font=("微软雅黑", 9)).grid(row=10, column=0, columnspan=3, sticky=tk.W, pady=5)
         
+        # 选项乱序（每份试卷独立打乱单选题选项）
+        self.shuffle_options_var = tk.IntVar(value=0)
+        tk.Checkbutton(left_frame, text="随机排列选项", variable=self.shuffle_options_var, 
+                      bg="#f0f8ff", font=("微软雅黑", 9)).grid(row=11, column=0, columnspan=3, sticky=tk.W, pady=5)
+        
         # 试卷数量设置
-        tk.Label(left_frame, text="生成试卷数量:", bg="#f0f8ff", font=("微软雅黑", 9)).grid(row=11, column=0, sticky=tk.W, pady=5)
+        tk.Label(left_frame, text="生成试卷数量:", bg="#f0f8ff", font=("微软雅黑", 9)).grid(row=12, column=0, sticky=tk.W, pady=5)
         self.exam_count = ttk.Combobox(left_frame, values=["1", "2", "3", "4", "5"], width=5)
         self.exam_count.current(0)
-        self.exam_count.grid(row=11, column=1, sticky=tk.W)
+        self.exam_count.grid(row=12, column=1, sticky=tk.W)
+        
+        # 题库概况（各题型题数分布）
+        self.summary_var = tk.StringVar(value="尚未加载题库")
+        tk.Label(left_frame, textvariable=self.summary_var, bg="#f0f8ff", font=("微软雅黑", 9), 
+                justify=tk.LEFT).grid(row=13, column=0, columnspan=3, sticky=tk.W, pady=(10, 5))
         
         # 右侧面板 - 预览和操作
         right_frame = tk.Frame(main_frame, bg="#f0f8ff")
         right_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
         
+        # 题目检索区域
+        search_frame = tk.LabelFrame(right_frame, text="题目检索", font=("微软雅黑", 10, "bold"), 
+                                   bg="#f0f8ff", padx=10, pady=5)
+        search_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", self.on_search_change)
+        self._search_job = None
+        tk.Entry(search_frame, textvariable=self.search_var, width=40).grid(row=0, column=0, sticky=tk.EW)
+        self.search_status_var = tk.StringVar()
+        tk.Label(search_frame, textvariable=self.search_status_var, bg="#f0f8ff", 
+                font=("微软雅黑", 9)).grid(row=0, column=1, columnspan=3, sticky=tk.W, padx=5)
+        
+        self.search_results = tk.Listbox(search_frame, height=5, font=("微软雅黑", 9), selectmode=tk.EXTENDED)
+        self.search_results.grid(row=1, column=0, rowspan=3, sticky=tk.NSEW, pady=5)
+        self._search_result_ids = []
+        
+        tk.Button(search_frame, text="必选", command=self.include_selected, 
+                 font=("微软雅黑", 9), width=6).grid(row=1, column=1, padx=5)
+        tk.Button(search_frame, text="排除", command=self.exclude_selected, 
+                 font=("微软雅黑", 9), width=6).grid(row=2, column=1, padx=5)
+        tk.Button(search_frame, text="移除", command=self.release_selected, 
+                 font=("微软雅黑", 9), width=6).grid(row=3, column=1, padx=5)
+        
+        # 必选题和排除题（题号集合）
+        self.include_ids = set()
+        self.exclude_ids = set()
+        self.pinned_var = tk.StringVar()
+        tk.Label(search_frame, textvariable=self.pinned_var, bg="#f0f8ff", font=("微软雅黑", 9), 
+                justify=tk.LEFT, wraplength=220).grid(row=1, column=2, rowspan=3, sticky=tk.NW)
+        search_frame.columnconfigure(0, weight=1)
+        self.update_pinned_label()
+        
         # 预览区域
         preview_frame = tk.LabelFrame(right_frame, text="试卷预览", font=("微软雅黑", 10, "bold"), 
                                     bg="#f0f8ff", padx=10, pady=10)
@@ -205,6 +255,11 @@ class ExamGeneratorGUI:
                             font=("微软雅黑", 9), bg="#e3f2fd")
         status_bar.pack(side=tk.BOTTOM, fill=tk.X)
     
+    def _number_input(self, parent):
+        """创建只接受数字的数值输入框，取值范围在加载题库后设置"""
+        validate = (self.root.register(lambda text: text.isdigit() or text == ""), '%P')
+        return ttk.Spinbox(parent, from_=0, to=0, width=7, validate='key', validatecommand=validate)
+    
     def on_export_mode_change(self, event):
         """导出模式改变时显示/隐藏比例设置"""
         mode = self.export_mode.get()
@@ -221,11 +276,11 @@ class ExamGeneratorGUI:
     def browse_file(self):
         """浏览Excel文件"""
         file_path = filedialog.askopenfilename(
-            filetypes=[("Excel文件", "*.xlsx *.xls"), ("所有文件", "*.*")]
+            filetypes=[("题库文件", "*.xlsx *.xls *.csv *.tsv *.jsonl"), ("Excel文件", "*.xlsx *.xls"), 
+                       ("文本题库", "*.csv *.tsv *.jsonl"), ("编译题库", "*.qbank"), ("所有文件", "*.*")]
         )
         if file_path:
             self.file_path_var.set(file_path)
-            self.exam_core.excel_path = file_path
             self.status_var.set(f"已选择文件: {os.path.basename(file_path)}")
     
     def load_excel(self):
@@ -234,82 +289,190 @@ class ExamGeneratorGUI:
             # 加载Excel数据
             self.exam_core.load_excel(self.file_path_var.get())
             
-            # 更新UI
+            # 更新UI：只使用加载时生成的题型汇总，耗时与题库规模无关
+            summary = self.exam_core.get_type_summary()
             judgment_count = self.exam_core.get_question_type_count('判断题')
             mcq_count = self.exam_core.get_question_type_count('单选题')
             
-            # 更新判断题UI
-            if judgment_count > 0:
-                self.judgment_count['values'] = list(range(1, judgment_count + 1))
-                self.judgment_count.current(0)
-            else:
-                self.judgment_count['values'] = []
-                self.judgment_var.set(0)
-            
-            # 更新单选题UI
-            if mcq_count > 0:
-                self.mcq_count['values'] = list(range(1, mcq_count + 1))
-                self.mcq_count.current(0)
-            else:
-                self.mcq_count['values'] = []
-                self.mcq_var.set(0)
-            
-            # 更新顺序导出范围
-            if judgment_count > 0:
-                judgment_numbers = self.exam_core.get_question_numbers('判断题')
-                self.judgment_start['values'] = judgment_numbers
-                self.judgment_end['values'] = judgment_numbers
-                self.judgment_start.current(0)
-                self.judgment_end.current(len(judgment_numbers) - 1)
-            else:
-                self.judgment_start['values'] = []
-                self.judgment_end['values'] = []
+            # 更新题数和顺序导出范围
+            self._update_type_inputs(summary.get('判断题'), self.judgment_var, 
+                                     self.judgment_count, self.judgment_start, self.judgment_end)
+            self._update_type_inputs(summary.get('单选题'), self.mcq_var, 
+                                     self.mcq_count, self.mcq_start, self.mcq_end)
+            self.update_summary_label(summary)
             
-            if mcq_count > 0:
-                mcq_numbers = self.exam_core.get_question_numbers('单选题')
-                self.mcq_start['values'] = mcq_numbers
-                self.mcq_end['values'] = mcq_numbers
-                self.mcq_start.current(0)
-                self.mcq_end.current(len(mcq_numbers) - 1)
-            else:
-                self.mcq_start['values'] = []
-                self.mcq_end['values'] = []
+            # 题号只对原题库有效，清空检索结果和必选/排除设置
+            self.include_ids.clear()
+            self.exclude_ids.clear()
+            self.update_pinned_label()
+            self.search_questions()
             
             self.status_var.set(f"题库加载成功: {judgment_count}道判断题, {mcq_count}道单选题")
+            
+            # 提示校验未通过的题目
+            report = self.exam_core.validation_report
+            if report:
+                lines = [f"第{item['题号']}题（{item['题型']}）: {item['问题']}" for item in report[:20]]
+                if len(report) > 20:
+                    lines.append(f"……共{len(report)}条")
+                messagebox.showwarning("题库校验", "以下题目未通过校验，已排除在抽题范围之外:\n" + "\n".join(lines))
+                self.status_var.set(f"题库加载成功: {judgment_count}道判断题, {mcq_count}道单选题（{len(report)}条校验问题）")
         except Exception as e:
             messagebox.showerror("错误", f"加载Excel文件失败:\n{str(e)}")
             self.status_var.set("加载失败")
     
+    def _update_type_inputs(self, summary, type_var, count_input, start_input, end_input):
+        """按题型汇总设置数量和范围输入框的取值范围及默认值"""
+        if summary is None:
+            for widget in (count_input, start_input, end_input):
+                widget.configure(from_=0, to=0)
+                widget.set("")
+            type_var.set(0)
+            return
+        
+        count_input.configure(from_=1, to=summary.count)
+        count_input.set(1)
+        for widget in (start_input, end_input):
+            widget.configure(from_=summary.first, to=summary.last)
+        start_input.set(summary.first)
+        end_input.set(summary.last)
+    
+    def update_summary_label(self, summary):
+        """以文本条形图显示各题型题数"""
+        if not summary:
+            self.summary_var.set("题库中没有可用的题目")
+            return
+        
+        largest = max(item.count for item in summary.values())
+        lines = ["题库概况:"]
+        for question_type, item in summary.items():
+            bar = "█" * max(1, round(item.count / largest * SUMMARY_BAR_WIDTH))
+            lines.append(f"{question_type} {bar} {item.count}道（题号{item.first}-{item.last}）")
+        self.summary_var.set("\n".join(lines))
+    
+    def _read_number(self, widget, question_type, label, use_range=False):
+        """读取数值输入框并按题型汇总检查范围"""
+        summary = self.exam_core.get_type_summary().get(question_type)
+        if summary is None:
+            raise ValueError(f"题库中没有可用的{question_type}！")
+        
+        low, high = (summary.first, summary.last) if use_range else (1, summary.count)
+        text = widget.get().strip()
+        if not text.isdigit() or not low <= int(text) <= high:
+            raise ValueError(f"{question_type}{label}必须是{low}到{high}之间的整数！")
+        return int(text)
+    
+    def get_config(self):
+        """收集界面上的用户设置"""
+        return {
+            'export_mode': self.export_mode.get(),
+            'include_judgment': self.judgment_var.get(),
+            'include_mcq': self.mcq_var.get(),
+            'include_answers': self.answer_var.get(),
+            'exam_title': self.exam_title.get(),
+            'student_name': self.student_name.get(),
+            'type_order': self.type_order.get(),
+            'random_order': self.random_order_var.get(),
+            'shuffle_options': self.shuffle_options_var.get(),
+            'judgment_count': self._read_number(self.judgment_count, '判断题', "数量") if self.judgment_var.get() else 0,
+            'mcq_count': self._read_number(self.mcq_count, '单选题', "数量") if self.mcq_var.get() else 0,
+            'judgment_ratio': int(self.judgment_ratio.get().strip('%')) if self.export_mode.get() == "按比例导出" else 0,
+            'mcq_ratio': int(self.mcq_ratio.get().strip('%')) if self.export_mode.get() == "按比例导出" else 0,
+            'total_questions': int(self.total_questions_cb.get()) if self.export_mode.get() == "按比例导出" else 0,
+            'judgment_start': self._read_number(self.judgment_start, '判断题', "起始题号", True) if self.judgment_var.get() and self.export_mode.get() == "顺序导出" else 0,
+            'judgment_end': self._read_number(self.judgment_end, '判断题', "结束题号", True) if self.judgment_var.get() and self.export_mode.get() == "顺序导出" else 0,
+            'mcq_start': self._read_number(self.mcq_start, '单选题', "起始题号", True) if self.mcq_var.get() and self.export_mode.get() == "顺序导出" else 0,
+            'mcq_end': self._read_number(self.mcq_end, '单选题', "结束题号", True) if self.mcq_var.get() and self.export_mode.get() == "顺序导出" else 0,
+            'include_ids': sorted(self.include_ids),
+            'exclude_ids': sorted(self.exclude_ids),
+        }
+    
+    def on_search_change(self, *args):
+        """检索输入变化时延迟检索，连续输入只检索一次"""
+        if self._search_job is not None:
+            self.root.after_cancel(self._search_job)
+        self._search_job = self.root.after(SEARCH_DELAY_MS, self.search_questions)
+    
+    def search_questions(self):
+        """检索题目并显示结果"""
+        if self._search_job is not None:
+            self.root.after_cancel(self._search_job)
+        self._search_job = None
+        self.search_results.delete(0, tk.END)
+        self._search_result_ids = []
+        
+        # 编译题库的索引在后台构建，完成前不在界面线程中等待
+        if not self.exam_core.search_ready:
+            self.search_status_var.set("索引构建中…")
+            self._search_job = self.root.after(SEARCH_DELAY_MS, self.search_questions)
+            return
+        
+        query = self.search_var.get()
+        if not query.strip():
+            self.search_status_var.set("")
+            return
+        
+        try:
+            results, has_more = self.exam_core.search(query, limit=SEARCH_RESULT_LIMIT)
+        except Exception as e:
+            self.search_status_var.set(f"检索失败: {str(e)}")
+            return
+        
+        for item in results:
+            self.search_results.insert(tk.END, f"{item['题号']}. [{item['题型']}] {item['题目']}")
+            self._search_result_ids.append(item['题号'])
+        more = f"（仅显示前{SEARCH_RESULT_LIMIT}条）" if has_more else ""
+        self.search_status_var.set(f"找到{len(results)}道题{more}")
+    
+    def _selected_result_ids(self):
+        """返回检索结果中选中的题号"""
+        return [self._search_result_ids[i] for i in self.search_results.curselection()]
+    
+    def include_selected(self):
+        """将选中的题目设为必选题"""
+        ids = self._selected_result_ids()
+        self.include_ids.update(ids)
+        self.exclude_ids.difference_update(ids)
+        self.update_pinned_label()
+    
+    def exclude_selected(self):
+        """将选中的题目设为排除题"""
+        ids = self._selected_result_ids()
+        self.exclude_ids.update(ids)
+        self.include_ids.difference_update(ids)
+        self.update_pinned_label()
+    
+    def release_selected(self):
+        """取消选中题目的必选/排除设置"""
+        ids = self._selected_result_ids()
+        self.include_ids.difference_update(ids)
+        self.exclude_ids.difference_update(ids)
+        self.update_pinned_label()
+    
+    def update_pinned_label(self):
+        """显示必选题和排除题"""
+        def describe(ids):
+            ids = sorted(ids)
+            text = ", ".join(str(i) for i in ids[:10])
+            if len(ids) > 10:
+                text += f" 等{len(ids)}道"
+            return text or "无"
+        self.pinned_var.set(f"必选: {describe(self.include_ids)}\n排除: {describe(self.exclude_ids)}")
+    
     def generate_preview(self):
         """生成试卷预览"""
         try:
             # 获取用户设置
-            config = {
-                'export_mode': self.export_mode.get(),
-                'include_judgment': self.judgment_var.get(),
-                'include_mcq': self.mcq_var.get(),
-                'include_answers': self.answer_var.get(),
-                'exam_title': self.exam_title.get(),
-                'student_name': self.student_name.get(),
-                'type_order': self.type_order.get(),
-                'random_order': self.random_order_var.get(),
-                'judgment_count': int(self.judgment_count.get()) if self.judgment_var.get() else 0,
-                'mcq_count': int(self.mcq_count.get()) if self.mcq_var.get() else 0,
-                'judgment_ratio': int(self.judgment_ratio.get().strip('%')) if self.export_mode.get() == "按比例导出" else 0,
-                'mcq_ratio': int(self.mcq_ratio.get().strip('%')) if self.export_mode.get() == "按比例导出" else 0,
-                'total_questions': int(self.total_questions_cb.get()) if self.export_mode.get() == "按比例导出" else 0,
-                'judgment_start': int(self.judgment_start.get()) if self.judgment_var.get() and self.export_mode.get() == "顺序导出" else 0,
-                'judgment_end': int(self.judgment_end.get()) if self.judgment_var.get() and self.export_mode.get() == "顺序导出" else 0,
-                'mcq_start': int(self.mcq_start.get()) if self.mcq_var.get() and self.export_mode.get() == "顺序导出" else 0,
-                'mcq_end': int(self.mcq_end.get()) if self.mcq_var.get() and self.export_mode.get() == "顺序导出" else 0,
-            }
+            config = self.get_config()
             
-            # 生成预览内容
-            preview_content, total_count = self.exam_core.generate_preview(config)
-            
-            # 显示预览
+            # 抽题完成后即开始显示，题目边渲染边写入预览区
+            total_count, chunks = self.exam_core.stream_preview(config)
             self.preview_text.delete(1.0, tk.END)
-            self.preview_text.insert(tk.END, preview_content)
+            self.status_var.set(f"正在生成预览: 共{total_count}道题")
+            for i, chunk in enumerate(chunks, start=1):
+                self.preview_text.insert(tk.END, chunk)
+                if i % PREVIEW_REFRESH_CHUNKS == 0:
+                    self.root.update_idletasks()
             self.status_var.set(f"预览生成完成: 共{total_count}道题")
         except Exception as e:
             messagebox.showerror("错误", f"生成预览失败:\n{str(e)}")
@@ -319,33 +482,18 @@ class ExamGeneratorGUI:
         """导出Word文档"""
         try:
             # 获取用户设置
-            config = {
-                'export_mode': self.export_mode.get(),
-                'include_judgment': self.judgment_var.get(),
-                'include_mcq': self.mcq_var.get(),
-                'include_answers': self.answer_var.get(),
-                'exam_title': self.exam_title.get(),
-                'student_name': self.student_name.get(),
-                'type_order': self.type_order.get(),
-                'random_order': self.random_order_var.get(),
-                'judgment_count': int(self.judgment_count.get()) if self.judgment_var.get() else 0,
-                'mcq_count': int(self.mcq_count.get()) if self.mcq_var.get() else 0,
-                'judgment_ratio': int(self.judgment_ratio.get().strip('%')) if self.export_mode.get() == "按比例导出" else 0,
-                'mcq_ratio': int(self.mcq_ratio.get().strip('%')) if self.export_mode.get() == "按比例导出" else 0,
-                'total_questions': int(self.total_questions_cb.get()) if self.export_mode.get() == "按比例导出" else 0,
-                'judgment_start': int(self.judgment_start.get()) if self.judgment_var.get() and self.export_mode.get() == "顺序导出" else 0,
-                'judgment_end': int(self.judgment_end.get()) if self.judgment_var.get() and self.export_mode.get() == "顺序导出" else 0,
-                'mcq_start': int(self.mcq_start.get()) if self.mcq_var.get() and self.export_mode.get() == "顺序导出" else 0,
-                'mcq_end': int(self.mcq_end.get()) if self.mcq_var.get() and self.export_mode.get() == "顺序导出" else 0,
-            }
+            config = self.get_config()
             
             exam_count = int(self.exam_count.get())
             
-            # 生成试卷数据
-            exam_data = self.exam_core.generate_exam_data(config)
+            # 每份试卷独立生成，导出时逐份逐题写入文档
+            records, exam_streams = self.exam_core.iter_exam_batch(config, exam_count)
             
             # 导出Word
-            export_to_word(exam_data, config, exam_count)
+            saved_paths = export_to_word(exam_streams, config, exam_count)
+            
+            # 记录已保存试卷的种子信息，便于日后重新生成
+            append_records(records[:len(saved_paths)])
             
             self.status_var.set(f"已成功生成 {exam_count} 份试卷")
             messagebox.showinfo("成功", f"已成功生成 {exam_count} 份试卷")
@@ -5,18 +5,109 @@
 1. 创建主窗口
 2. 初始化应用程序
 3. 启动主事件循环
+4. 命令行重新生成历史试卷
+5. 命令行编译题库
+6. 启动本地服务模式
+
+用法：
+- python main.py                       启动图形界面
+- python main.py regenerate 试卷编号    根据试卷记录重新生成Word文档
+- python main.py compile 题库 输出.qbank  将题库编译为mmap格式
+- python main.py serve --bank 题库       启动本地试卷生成服务
 
 依赖：
 - gui.ExamGeneratorGUI
+- core.ExamCore
+- records
+- server
+- readers
 """
 
 from gui import ExamGeneratorGUI
 import tkinter as tk
+import argparse
+import sys
+from core import ExamCore
+from docx_utils import build_exam_document
+from records import find_record
+from server import ExamService, parse_bank_args
+from readers import READERS
+from config import EXAM_RECORD_LOG
 
 def main():
     root = tk.Tk()
     app = ExamGeneratorGUI(root)
     root.mainloop()
 
+def regenerate(argv):
+    """根据试卷记录重新生成Word文档"""
+    parser = argparse.ArgumentParser(prog="main.py regenerate", description="根据试卷记录重新生成试卷")
+    parser.add_argument("exam_id", help="试卷编号（见试卷记录日志）")
+    parser.add_argument("--log", default=EXAM_RECORD_LOG, help="试卷记录日志路径")
+    parser.add_argument("--bank", default=None, help="题库文件路径（默认使用记录中的路径）")
+    parser.add_argument("--output", default=None, help="输出Word文件路径")
+    args = parser.parse_args(argv)
+    
+    try:
+        record = find_record(args.exam_id, args.log)
+        exam_data = ExamCore().regenerate(record, args.bank)
+    except (ValueError, OSError) as e:
+        print(f"重新生成失败: {e}", file=sys.stderr)
+        return 1
+    
+    output_path = args.output or f"试卷_{args.exam_id}.docx"
+    doc = build_exam_document(exam_data, record['variant'] + 1, record['exam_count'])
+    doc.save(output_path)
+    print(f"已重新生成试卷 {args.exam_id}: {output_path}")
+    return 0
+
+def compile_bank(argv):
+    """将题库编译为.qbank文件"""
+    parser = argparse.ArgumentParser(prog="main.py compile", description="将题库编译为mmap格式(.qbank)")
+    parser.add_argument("bank", help="题库文件路径")
+    parser.add_argument("output", help="输出.qbank文件路径")
+    parser.add_argument("--reader", choices=list(READERS), default=None, help="题库格式（默认按扩展名识别）")
+    args = parser.parse_args(argv)
+    
+    try:
+        exam_core = ExamCore()
+        exam_core.load_excel(args.bank, args.reader)
+        exam_core.compile_bank(args.output)
+    except (ValueError, OSError) as e:
+        print(f"编译题库失败: {e}", file=sys.stderr)
+        return 1
+    
+    print(f"已编译题库: {args.output}（{len(exam_core.exam_data)}道题）")
+    return 0
+
+def serve(argv):
+    """启动本地试卷生成服务"""
+    parser = argparse.ArgumentParser(prog="main.py serve", description="启动本地试卷生成服务")
+    parser.add_argument("--bank", action="append", default=[], help="题库，格式为 名称=路径 或 路径，可重复")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("--workers", type=int, default=4, help="渲染进程数")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="同时进行的生成请求上限")
+    parser.add_argument("--log", default=EXAM_RECORD_LOG, help="试卷记录日志路径")
+    args = parser.parse_args(argv)
+    
+    try:
+        service = ExamService(parse_bank_args(args.bank), args.workers, args.max_concurrency, args.log)
+    except (ValueError, OSError) as e:
+        print(f"加载题库失败: {e}", file=sys.stderr)
+        return 1
+    
+    try:
+        service.serve(args.host, args.port)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "regenerate":
+        sys.exit(regenerate(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "compile":
+        sys.exit(compile_bank(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        sys.exit(serve(sys.argv[2:]))
     main()
\ No newline at end of file
@@ -0,0 +1,192 @@
+"""
+考试试卷生成系统 - 编译题库格式(.qbank)
+
+功能：
+1. 将已加载的题库编译为.qbank二进制文件
+2. 以mmap只读方式打开.qbank，多个进程共享同一份页缓存
+
+文件布局（小端序，各段按8字节对齐）：
+- 魔数 b"QBANK\\0" + 版本号(uint16)
+- 头部长度(uint32) + 头部JSON：题数、题型名称表、字段表、各段偏移、题库哈希、校验报告
+- 定长数组：题型编码(uint8)、题号(int32)、答案编码(uint8)、选项非空位图(uint8)、有效标记(uint8)
+- 偏移表：每个文本字段一列uint64，共(字段数, 题数+1)
+- 文本堆：所有文本字段的UTF-8字节顺序拼接
+
+打开时间只与头部大小有关，与题库规模无关；题目和选项文本按需从文本堆解码。
+
+接口：
+- compile_bank(exam_data, bank_hash, output_path, validation_report): 编译题库
+- QBank(path): 打开编译题库
+  - count: 题数
+  - type_names: 题型名称表
+  - type_code / number / answer_code / option_mask: 定长数组（只读视图）
+  - text(field, index): 读取文本字段
+  - answers(): 解码全部答案
+  - to_frame(): 构造不含文本列的轻量DataFrame
+
+依赖：
+- numpy
+- pandas
+"""
+
+import json
+import mmap
+import struct
+import numpy as np
+import pandas as pd
+
+MAGIC = b"QBANK\0"
+VERSION = 2
+
+# 文本堆中保存的字段
+TEXT_FIELDS = ['题目', '选项A', '选项B', '选项C', '选项D', '选项E', '正确答案']
+
+# 答案编码，0表示其他答案（需从文本堆读取原文）
+ANSWER_CODES = ['', 'A', 'B', 'C', 'D', 'E', '√', '×', '1', '0']
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+def _cell_text(value):
+    """将单元格转换为文本，空值为空字符串"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    return str(value)
+
+def compile_bank(exam_data, bank_hash, output_path, validation_report=None):
+    """
+    将已加载的题库DataFrame编译为.qbank文件
+    
+    参数：
+    exam_data: ExamCore.load_excel()加载并清洗后的DataFrame
+    bank_hash: 源题库的内容哈希，写入头部以便试卷记录互通
+    output_path: 输出文件路径
+    validation_report: 加载时的校验报告，写入头部
+    """
+    count = len(exam_data)
+    type_values = exam_data['题型'].astype(str)
+    type_names = list(dict.fromkeys(type_values))
+    type_code = type_values.map({name: i for i, name in enumerate(type_names)}).to_numpy(dtype=np.uint8)
+    number = exam_data['题号'].to_numpy(dtype=np.int32)
+    
+    answers = exam_data['正确答案'].map(_cell_text)
+    answer_code = answers.map({code: i for i, code in enumerate(ANSWER_CODES)}).fillna(0).to_numpy(dtype=np.uint8)
+    
+    # 选项非空位图：第i位对应选项A+i
+    option_mask = exam_data['选项位图'].to_numpy(dtype=np.uint8)
+    valid = exam_data['有效'].to_numpy(dtype=np.uint8)
+    
+    # 文本堆和偏移表
+    offsets = np.zeros((len(TEXT_FIELDS), count + 1), dtype=np.uint64)
+    chunks = []
+    heap_size = 0
+    for f, field in enumerate(TEXT_FIELDS):
+        if field in exam_data.columns:
+            values = exam_data[field].map(_cell_text).str.encode('utf-8')
+        else:
+            values = [b""] * count
+        lengths = np.fromiter((len(v) for v in values), dtype=np.uint64, count=count)
+        offsets[f, 1:] = heap_size + np.cumsum(lengths)
+        offsets[f, 0] = heap_size
+        heap_size = int(offsets[f, -1])
+        chunks.extend(values)
+    
+    arrays = [
+        ('type_code', type_code),
+        ('number', number),
+        ('answer_code', answer_code),
+        ('option_mask', option_mask),
+        ('valid', valid),
+        ('offsets', offsets),
+    ]
+    
+    # 先以占位偏移计算头部长度，再回填真实偏移
+    header = {
+        'version': VERSION,
+        'count': count,
+        'type_names': type_names,
+        'text_fields': TEXT_FIELDS,
+        'bank_hash': bank_hash,
+        'validation_report': validation_report or [],
+        'arrays': {name: [0, str(array.dtype), list(array.shape)] for name, array in arrays},
+        'heap': [0, heap_size],
+    }
+    prefix_size = len(MAGIC) + 2 + 4
+    for _ in range(2):
+        header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        position = _align(prefix_size + len(header_bytes))
+        for name, array in arrays:
+            header['arrays'][name][0] = position
+            position = _align(position + array.nbytes)
+        header['heap'][0] = position
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    
+    with open(output_path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<HI', VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays:
+            f.write(b"\0" * (header['arrays'][name][0] - f.tell()))
+            f.write(array.tobytes())
+        f.write(b"\0" * (header['heap'][0] - f.tell()))
+        f.write(b"".join(chunks))
+
+class QBank:
+    """以mmap只读方式打开的编译题库"""
+    
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        prefix_size = len(MAGIC) + 2 + 4
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"不是有效的编译题库文件: {path}")
+        version, header_len = struct.unpack('<HI', self._mmap[len(MAGIC):prefix_size])
+        if version != VERSION:
+            raise ValueError(f"不支持的编译题库版本: {version}")
+        
+        self.header = json.loads(self._mmap[prefix_size:prefix_size + header_len].decode('utf-8'))
+        self.count = self.header['count']
+        self.type_names = self.header['type_names']
+        self.text_fields = self.header['text_fields']
+        self.bank_hash = self.header['bank_hash']
+        
+        # 定长数组均为mmap上的只读视图，不复制数据
+        for name, (offset, dtype, shape) in self.header['arrays'].items():
+            size = int(np.prod(shape))
+            array = np.frombuffer(self._mmap, dtype=dtype, count=size, offset=offset).reshape(shape)
+            setattr(self, name, array)
+        
+        self._heap_offset = self.header['heap'][0]
+        self._field_index = {field: i for i, field in enumerate(self.text_fields)}
+    
+    def __reduce__(self):
+        # 传给工作进程时只传路径，子进程重新mmap，共享同一份页缓存
+        return (QBank, (self.path,))
+    
+    def text(self, field, index):
+        """读取第index题（从0开始）的文本字段，空值返回空字符串"""
+        offsets = self.offsets[self._field_index[field]]
+        start = self._heap_offset + int(offsets[index])
+        end = self._heap_offset + int(offsets[index + 1])
+        return self._mmap[start:end].decode('utf-8')
+    
+    def answers(self):
+        """解码全部答案，常见答案直接查表，其余从文本堆读取"""
+        answers = np.array(ANSWER_CODES, dtype=object)[self.answer_code]
+        for index in np.flatnonzero(self.answer_code == 0):
+            answers[index] = self.text('正确答案', index)
+        return answers
+    
+    def to_frame(self):
+        """构造不含文本列的DataFrame（列与ExamCore清洗后的题库一致），文本列保留在mmap中"""
+        answer_index = self.answer_code.astype(np.int8) - 1
+        answer_index[(self.answer_code == 0) | (self.answer_code > 5)] = -1
+        return pd.DataFrame({
+            '题型': pd.Categorical.from_codes(self.type_code.astype(np.int16), self.type_names),
+            '题号': self.number,
+            '正确答案': self.answers(),
+            '选项位图': self.option_mask,
+            '答案序号': answer_index,
+            '有效': self.valid.astype(bool),
+        })
\ No newline at end of file
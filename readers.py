@@ -0,0 +1,99 @@
+"""
+考试试卷生成系统 - 题库读取后端
+
+功能：
+1. 按扩展名或显式指定选择题库读取后端
+2. Excel(.xlsx/.xls)：pandas.read_excel
+3. CSV/TSV：pandas C引擎解析，所有列按字符串读取，不做类型推断
+   （Excel按单元格原值读取，不把含空行的数字列推断为浮点）
+4. JSONL：逐行解析，每行一个JSON对象
+
+各后端只负责把文件读成原始DataFrame，必需列检查和清洗统一由
+ExamCore.load_excel完成，因此不同格式的同一题库加载结果一致。
+
+接口：
+- READERS: 读取后端注册表 {名称: 读取函数}
+- register_reader(name, extensions): 注册读取后端的装饰器
+- reader_for(file_path, reader): 返回读取后端名称
+- read_bank(file_path, reader): 读取题库为原始DataFrame
+
+依赖：
+- pandas
+"""
+
+import json
+import os
+import pandas as pd
+
+# 读取后端注册表：名称 -> 读取函数
+READERS = {}
+
+# 扩展名 -> 读取后端名称
+EXTENSIONS = {}
+
+def register_reader(name, extensions=()):
+    """注册读取后端，extensions为对应的扩展名（小写，含点号）"""
+    def decorator(func):
+        READERS[name] = func
+        for extension in extensions:
+            EXTENSIONS[extension] = name
+        return func
+    return decorator
+
+def reader_for(file_path, reader=None):
+    """返回读取后端名称：显式指定时使用指定后端，否则按扩展名选择"""
+    if reader is not None:
+        if reader not in READERS:
+            raise ValueError(f"不支持的题库格式: {reader}（可选: {', '.join(READERS)}）")
+        return reader
+    
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in EXTENSIONS:
+        raise ValueError(f"无法识别题库文件格式: {os.path.basename(file_path)}")
+    return EXTENSIONS[extension]
+
+def read_bank(file_path, reader=None):
+    """读取题库文件为原始DataFrame（未清洗）"""
+    return READERS[reader_for(file_path, reader)](file_path)
+
+@register_reader('xlsx', ['.xlsx', '.xls'])
+def read_xlsx(file_path):
+    """读取Excel题库，单元格保留原值（整数不会因同列空单元格变为浮点）"""
+    return pd.read_excel(file_path, dtype=object)
+
+def _read_delimited(file_path, sep):
+    """
+    用C引擎读取分隔符文本题库
+    
+    所有列显式按字符串读取，跳过逐列类型推断；只有空单元格视为缺失，
+    "NA"、"None"等文本保留原样。
+    """
+    return pd.read_csv(file_path, sep=sep, engine='c', dtype=str, encoding='utf-8-sig',
+                       keep_default_na=False, na_values=[''])
+
+@register_reader('csv', ['.csv'])
+def read_csv(file_path):
+    """读取CSV题库"""
+    return _read_delimited(file_path, ',')
+
+@register_reader('tsv', ['.tsv', '.tab'])
+def read_tsv(file_path):
+    """读取TSV题库"""
+    return _read_delimited(file_path, '\t')
+
+@register_reader('jsonl', ['.jsonl', '.ndjson'])
+def read_jsonl(file_path):
+    """逐行读取JSONL题库，每行一个JSON对象，空行忽略"""
+    records = []
+    with open(file_path, 'r', encoding='utf-8-sig') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"JSONL第{line_number}行格式错误: {e.msg}")
+            if not isinstance(record, dict):
+                raise ValueError(f"JSONL第{line_number}行不是JSON对象")
+            records.append(record)
+    return pd.DataFrame.from_records(records)
\ No newline at end of file
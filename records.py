@@ -0,0 +1,48 @@
+"""
+考试试卷生成系统 - 试卷记录日志
+
+功能：
+1. 以追加方式保存试卷生成记录（每行一条JSON）
+2. 读取和查找历史试卷记录
+
+每条记录只包含题库内容哈希、规范化配置、随机种子和份号，
+配合ExamCore.regenerate()即可重现试卷，无需保留Word文件。
+
+接口：
+- append_records(records, log_path): 追加写入记录
+- load_records(log_path): 读取全部记录
+- find_record(exam_id, log_path): 按试卷编号查找记录
+
+依赖：
+- config
+"""
+
+import json
+import os
+from config import EXAM_RECORD_LOG
+
+def append_records(records, log_path=EXAM_RECORD_LOG):
+    """追加写入试卷记录"""
+    with open(log_path, 'a', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False, sort_keys=True) + "\n")
+
+def load_records(log_path=EXAM_RECORD_LOG):
+    """读取全部试卷记录"""
+    if not os.path.exists(log_path):
+        return []
+    
+    records = []
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records
+
+def find_record(exam_id, log_path=EXAM_RECORD_LOG):
+    """按试卷编号查找记录，同一编号以最后一条为准"""
+    matches = [record for record in load_records(log_path) if record['exam_id'] == exam_id]
+    if not matches:
+        raise ValueError(f"未找到试卷记录: {exam_id}")
+    return matches[-1]
\ No newline at end of file
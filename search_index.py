@@ -0,0 +1,201 @@
+"""
+考试试卷生成系统 - 题目检索索引
+
+功能：
+1. 对题目和选项文本建立字符二元组（bigram）倒排索引，单字查询使用一元索引
+2. 倒排表以差分+变长字节(varint)编码压缩存储，按需解码
+3. 候选题目经原文子串校验后返回，结果按题号排序
+
+索引以numpy整体构建：所有文本拼接为一个码点数组，每个(二元组, 题目)对
+编码为一个uint64后一次排序去重，不逐行构建Python字典。
+
+接口：
+- SearchIndex(texts_func, count): 检索索引（首次使用时构建，可调用build()提前构建）
+  - build(): 构建索引，失败时记录到error并抛出
+  - build_in_background(): 在后台线程中构建索引
+  - ready: 索引是否已构建完成
+  - error: 构建失败时的异常，之后的build()和search()均抛出该异常
+  - search(query, limit): 返回(匹配的行号数组, 是否还有更多结果)
+
+依赖：
+- numpy
+"""
+
+import threading
+import numpy as np
+
+# 一元键的第二个码点占位（大于任何Unicode码点）
+UNIGRAM_MARK = 0x1FFFFF
+
+# 行号占用的位数，索引最多支持 2^22 道题
+ROW_BITS = 22
+
+def _encode_varint(values):
+    """将非负整数数组编码为LEB128变长字节"""
+    values = values.astype(np.uint64)
+    nbytes = np.ones(len(values), dtype=np.int64)
+    for k in range(1, 5):
+        nbytes += values >= (1 << (7 * k))
+    starts = np.cumsum(nbytes) - nbytes
+    out = np.empty(int(nbytes.sum()), dtype=np.uint8)
+    for k in range(5):
+        selected = nbytes > k
+        if not selected.any():
+            break
+        low = (values[selected] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = (nbytes[selected] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[selected] + k] = (low | more).astype(np.uint8)
+    return out, nbytes
+
+def _decode_varint(data):
+    """解码LEB128变长字节为uint64数组"""
+    ends = (data & 0x80) == 0
+    starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+    group = np.cumsum(np.concatenate(([False], ends[:-1])))
+    shift = (np.arange(len(data)) - starts[group]) * 7
+    parts = (data & 0x7F).astype(np.uint64) << shift.astype(np.uint64)
+    return np.add.reduceat(parts, starts)
+
+class SearchIndex:
+    """题目文本的字符二元组倒排索引"""
+    
+    def __init__(self, texts_func, count):
+        """
+        参数：
+        texts_func: 无参函数，返回按行号排列的检索文本列表
+        count: 题目数
+        """
+        self.count = count
+        self._texts_func = texts_func
+        self._texts = None
+        self._keys = None
+        self._offsets = None
+        self._postings = None
+        self.error = None
+        self._lock = threading.Lock()
+    
+    @property
+    def ready(self):
+        """索引是否已构建完成"""
+        return self._keys is not None
+    
+    def build(self):
+        """构建索引（已构建时直接返回，曾构建失败时抛出同一异常）"""
+        if self._keys is not None:
+            return
+        with self._lock:
+            if self._keys is not None:
+                return
+            if self.error is not None:
+                raise self.error
+            try:
+                self._build()
+            except Exception as e:
+                self.error = e
+                raise
+    
+    def build_in_background(self):
+        """在后台守护线程中构建索引，失败原因记录在error中"""
+        def run():
+            try:
+                self.build()
+            except Exception:
+                pass  # 已记录到self.error，由检索时抛出
+        threading.Thread(target=run, daemon=True).start()
+    
+    def _build(self):
+        """构建索引（内部方法，调用方持有锁）"""
+        if self.count >= (1 << ROW_BITS):
+            raise ValueError(f"题库过大，检索索引最多支持{(1 << ROW_BITS) - 1}道题")
+        
+        texts = [text.lower() for text in self._texts_func()]
+        
+        # 以\0分隔拼接全部文本，分隔符两侧不构成二元组
+        codes = np.frombuffer("\0".join(texts).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+        separator = codes == 0
+        rows = np.cumsum(separator).astype(np.uint64)
+        
+        unigram = ~separator
+        bigram = unigram[:-1] & unigram[1:]
+        keys = np.concatenate((
+            (codes[unigram] << np.uint64(21)) | np.uint64(UNIGRAM_MARK),
+            (codes[:-1][bigram] << np.uint64(21)) | codes[1:][bigram],
+        ))
+        key_rows = np.concatenate((rows[unigram], rows[:-1][bigram]))
+        
+        # 每个(键, 行号)合成一个uint64，排序去重后即按键分组、组内行号递增
+        pairs = (keys << np.uint64(ROW_BITS)) | key_rows
+        pairs.sort()
+        if not len(pairs):
+            # 空题库或全部文本为空：没有任何键
+            self._texts = texts
+            self._postings = np.empty(0, dtype=np.uint8)
+            self._offsets = np.zeros(1, dtype=np.int64)
+            self._keys = np.empty(0, dtype=np.uint64)
+            return
+        pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+        pair_keys = pairs >> np.uint64(ROW_BITS)
+        pair_rows = pairs & np.uint64((1 << ROW_BITS) - 1)
+        
+        first = np.concatenate(([True], pair_keys[1:] != pair_keys[:-1]))
+        deltas = pair_rows.copy()
+        deltas[1:][~first[1:]] = pair_rows[1:][~first[1:]] - pair_rows[:-1][~first[1:]]
+        postings, nbytes = _encode_varint(deltas)
+        
+        byte_ends = np.cumsum(nbytes)
+        group_starts = np.flatnonzero(first)
+        offsets = np.zeros(len(group_starts) + 1, dtype=np.int64)
+        offsets[1:] = byte_ends[np.append(group_starts[1:], len(pairs)) - 1]
+        
+        self._texts = texts
+        self._postings = postings
+        self._offsets = offsets
+        self._keys = pair_keys[first]
+    
+    def _posting(self, key):
+        """返回键对应的行号数组"""
+        i = np.searchsorted(self._keys, key)
+        if i >= len(self._keys) or self._keys[i] != key:
+            return np.empty(0, dtype=np.uint64)
+        return np.cumsum(_decode_varint(self._postings[self._offsets[i]:self._offsets[i + 1]]))
+    
+    def search(self, query, limit=100, candidates=None):
+        """
+        检索包含query的题目
+        
+        参数：
+        query: 查询文本（不区分大小写）
+        limit: 最多返回的结果数
+        candidates: 可选的行号数组，只在其中检索
+        
+        返回：
+        (匹配的行号数组, 是否还有更多结果)
+        """
+        self.build()
+        query = query.strip().lower()
+        if not query:
+            return np.empty(0, dtype=np.int64), False
+        
+        if len(query) == 1:
+            keys = {(ord(query) << 21) | UNIGRAM_MARK}
+        else:
+            keys = {(ord(a) << 21) | ord(b) for a, b in zip(query, query[1:])}
+        
+        # 从最短的倒排表开始求交集
+        postings = sorted((self._posting(np.uint64(key)) for key in keys), key=len)
+        rows = postings[0]
+        for posting in postings[1:]:
+            if not len(rows):
+                break
+            rows = np.intersect1d(rows, posting, assume_unique=True)
+        if candidates is not None:
+            rows = np.intersect1d(rows, candidates, assume_unique=True)
+        
+        # 二元组全部命中不代表连续出现，用原文校验
+        matches = []
+        for row in rows.astype(np.int64):
+            if len(query) <= 2 or query in self._texts[row]:
+                matches.append(row)
+                if len(matches) > limit:
+                    return np.array(matches[:limit], dtype=np.int64), True
+        return np.array(matches, dtype=np.int64), False
\ No newline at end of file
@@ -0,0 +1,564 @@
+"""
+考试试卷生成系统 - 本地服务模式
+
+功能：
+1. 常驻内存保存已加载的题库（ExamCore），避免每位教师各自重复加载
+2. 接收JSON格式的预览/导出请求，配置字段与GUI的config字典一致
+3. 在渲染进程池中并行生成和渲染试卷，按份号顺序以分块传输方式发出
+4. 限制并发生成数量，统计各接口请求延迟
+
+python-docx渲染和预览生成是纯Python的CPU密集计算，受GIL限制，线程池
+只能用到一个核心，因此放在进程池中执行。渲染进程只接收试卷记录，按记录中
+的题库路径各自加载题库（.qbank为mmap映射，多个进程共享页缓存），再用
+regenerate()重现试卷；题库哈希与记录不一致时重新加载。配置校验、抽题生成
+记录和.zip打包在主进程的线程池中进行。
+
+接口（HTTP，默认仅监听127.0.0.1）：
+- GET  /banks    已加载题库及各题型数量
+- POST /preview  {"bank": 题库名, "config": {...}} -> 预览文本
+- POST /export   {"bank": 题库名, "config": {...}, "exam_count": n} -> .docx（多份时为.zip）
+- GET  /metrics  请求数、并发数和延迟统计
+
+- ExamService(banks, workers, max_concurrency): 服务类（workers为渲染进程数）
+  - load_bank(name, path): 加载题库
+  - serve(host, port): 启动服务
+
+依赖：
+- core.ExamCore
+- docx_utils
+- records
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import quote
+from core import ExamCore
+from docx_utils import ExamDocumentBuilder
+from records import append_records
+from config import DEFAULT_EXAM_TITLE, DEFAULT_STUDENT_INFO, EXAM_RECORD_LOG
+
+# 请求未提供的配置项使用与GUI加载题库后的默认值一致的取值；
+# 顺序导出范围默认为该题型的全部题号，题库中没有的题型默认不选（见_complete_config）
+DEFAULT_CONFIG = {
+    'export_mode': "随机抽取",
+    'include_judgment': 1,
+    'include_mcq': 1,
+    'include_answers': 0,
+    'exam_title': DEFAULT_EXAM_TITLE,
+    'student_name': DEFAULT_STUDENT_INFO,
+    'type_order': "判断题→单选题",
+    'random_order': 1,
+    'shuffle_options': 0,
+    'judgment_count': 1,
+    'mcq_count': 1,
+    'judgment_ratio': 20,
+    'mcq_ratio': 80,
+    'total_questions': 100,
+    'judgment_start': 0,
+    'judgment_end': 0,
+    'mcq_start': 0,
+    'mcq_end': 0,
+    'include_ids': [],
+    'exclude_ids': [],
+}
+
+EXPORT_MODES = ("随机抽取", "按比例导出", "顺序导出")
+
+TYPE_ORDERS = ("判断题→单选题", "单选题→判断题")
+
+# 取值为0/1的开关配置项
+FLAG_KEYS = ['include_judgment', 'include_mcq', 'include_answers', 'random_order', 'shuffle_options']
+
+# 题型 -> (是否包含, 数量, 起始题号, 结束题号)对应的配置项
+TYPE_KEYS = {
+    '判断题': ('include_judgment', 'judgment_count', 'judgment_start', 'judgment_end'),
+    '单选题': ('include_mcq', 'mcq_count', 'mcq_start', 'mcq_end'),
+}
+
+# 未知路径的请求合并统计，避免任意路径使延迟统计无限增长
+UNKNOWN_ROUTE = "*"
+
+# 单次请求最多生成的试卷份数
+MAX_EXAM_COUNT = 100
+
+# 请求体大小上限（字节）
+MAX_BODY_SIZE = 1 << 20
+
+# 流式返回时每块的大小（字节）
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# 每个接口保留的最近延迟样本数
+LATENCY_WINDOW = 1000
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+class HTTPError(Exception):
+    """带HTTP状态码的请求错误"""
+    
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class ExamService:
+    def __init__(self, banks=None, workers=4, max_concurrency=8, record_log=EXAM_RECORD_LOG):
+        """
+        参数：
+        banks: {题库名: 文件路径}，启动时加载
+        workers: 渲染进程数（也是每个导出请求最多提前渲染的份数）
+        max_concurrency: 同时进行的生成请求上限，超出的请求排队等待
+        record_log: 试卷记录日志路径
+        """
+        self.banks = {}
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.render_pool = None
+        self.max_concurrency = max_concurrency
+        self.record_log = record_log
+        self._record_lock = threading.Lock()
+        self._semaphore = None
+        self._in_flight = 0
+        self._started_at = time.time()
+        self._latencies = {}
+        self._counts = {}
+        
+        for name, path in (banks or {}).items():
+            self.load_bank(name, path)
+    
+    def load_bank(self, name, path):
+        """加载题库并常驻内存"""
+        exam_core = ExamCore()
+        exam_core.load_excel(path)
+        self.banks[name] = exam_core
+    
+    def serve(self, host="127.0.0.1", port=8765):
+        """启动服务（阻塞直到被中断）"""
+        asyncio.run(self._serve(host, port))
+    
+    async def _serve(self, host, port):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        # 使用spawn启动渲染进程：与Windows行为一致，也避免在已有线程的进程中fork
+        self.render_pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_render_worker,
+            initargs=([exam_core.excel_path for exam_core in self.banks.values()],),
+        )
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        print(f"试卷生成服务已启动: http://{host}:{port}（题库: {', '.join(self.banks) or '无'}）")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(wait=False)
+            self.render_pool.shutdown(wait=False, cancel_futures=True)
+    
+    async def _handle_connection(self, reader, writer):
+        """处理单个连接上的一个请求（响应后关闭连接）"""
+        start = time.perf_counter()
+        route = "?"
+        status = 500
+        try:
+            method, path, body = await self._read_request(reader)
+            route = path if any(route_path == path for _, route_path in self._routes()) else UNKNOWN_ROUTE
+            status = await self._dispatch(method, path, body, writer)
+        except HTTPError as e:
+            status = e.status
+            await self._send_json(writer, status, {'error': str(e)})
+        except ConnectionError:
+            # 客户端提前断开，无法再发送响应（499仅用于延迟统计）
+            status = 499
+        except Exception as e:
+            status = 500
+            await self._send_json(writer, status, {'error': f"服务器内部错误: {e}"})
+        finally:
+            self._record_latency(route, status, time.perf_counter() - start)
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+    
+    async def _read_request(self, reader):
+        """解析请求行、请求头和请求体"""
+        request_line = (await reader.readline()).decode('latin-1').strip()
+        parts = request_line.split()
+        if len(parts) != 3:
+            raise HTTPError(400, "无效的请求行")
+        method, path, _ = parts
+        
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            key, _, value = line.partition(':')
+            headers[key.strip().lower()] = value.strip()
+        
+        try:
+            length = int(headers.get('content-length', 0) or 0)
+        except ValueError:
+            raise HTTPError(400, "无效的Content-Length")
+        if length < 0:
+            raise HTTPError(400, "无效的Content-Length")
+        if length > MAX_BODY_SIZE:
+            raise HTTPError(413, "请求体过大")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), path.split('?', 1)[0], body
+    
+    def _routes(self):
+        return {
+            ('GET', '/banks'): self._handle_banks,
+            ('GET', '/metrics'): self._handle_metrics,
+            ('POST', '/preview'): self._handle_preview,
+            ('POST', '/export'): self._handle_export,
+        }
+    
+    async def _dispatch(self, method, path, body, writer):
+        routes = self._routes()
+        if (method, path) not in routes:
+            if any(route_path == path for _, route_path in routes):
+                raise HTTPError(405, f"不支持的请求方法: {method}")
+            raise HTTPError(404, f"未知路径: {path}")
+        return await routes[(method, path)](body, writer)
+    
+    async def _handle_banks(self, body, writer):
+        banks = {
+            name: {
+                'path': exam_core.excel_path,
+                'bank_hash': exam_core.bank_hash,
+                '判断题': exam_core.get_question_type_count('判断题'),
+                '单选题': exam_core.get_question_type_count('单选题'),
+            }
+            for name, exam_core in self.banks.items()
+        }
+        await self._send_json(writer, 200, banks)
+        return 200
+    
+    async def _handle_metrics(self, body, writer):
+        await self._send_json(writer, 200, self.metrics())
+        return 200
+    
+    async def _handle_preview(self, body, writer):
+        exam_core, config, _ = self._parse_generation_request(body)
+        content, total_count = await self._run_limited(
+            self.render_pool, _render_preview, exam_core.excel_path, exam_core.bank_hash, config
+        )
+        await self._send_json(writer, 200, {'content': content, 'total_count': total_count})
+        return 200
+    
+    async def _handle_export(self, body, writer):
+        exam_core, config, exam_count = self._parse_generation_request(body)
+        async with self._limited():
+            # 先校验配置、抽题并生成试卷记录，出错时仍可返回400；
+            # 试卷内容由渲染进程按记录重现，这里不迭代事件流
+            records, _ = await self._run_in_executor(self.executor, exam_core.iter_exam_batch, config, exam_count)
+            
+            if exam_count == 1:
+                filename = "试卷_1.docx"
+                content_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+            else:
+                filename, content_type = "试卷.zip", "application/zip"
+            headers = {
+                'Content-Type': content_type,
+                'Content-Disposition': f"attachment; filename*=UTF-8''{quote(filename)}",
+                'X-Exam-Ids': ",".join(record['exam_id'] for record in records),
+            }
+            await self._start_stream(writer, 200, headers)
+            
+            # 最多提前提交workers份试卷并行渲染，按份号顺序发送，内存中最多保留workers份
+            loop = asyncio.get_running_loop()
+            pending = deque()
+            packer = _ZipPacker() if exam_count > 1 else None
+            next_num = 1
+            try:
+                for exam_num in range(1, exam_count + 1):
+                    while next_num <= exam_count and len(pending) < self.workers:
+                        pending.append(loop.run_in_executor(
+                            self.render_pool, _render_paper, records[next_num - 1], next_num, exam_count
+                        ))
+                        next_num += 1
+                    data = await pending.popleft()
+                    if packer is not None:
+                        data = await loop.run_in_executor(self.executor, packer.add, f"试卷_{exam_num}.docx", data)
+                    await self._write_chunk(writer, data)
+                if packer is not None:
+                    await self._write_chunk(writer, await loop.run_in_executor(self.executor, packer.close))
+            except ConnectionError:
+                # 客户端断开：取消尚未开始的渲染
+                for future in pending:
+                    future.cancel()
+                raise
+            except Exception:
+                for future in pending:
+                    future.cancel()
+                # 响应头已发出，不发送结束块，客户端据此判断响应不完整
+                return 500
+            await self._end_stream(writer)
+            await loop.run_in_executor(self.executor, self._append_records, records)
+        return 200
+    
+    def _parse_generation_request(self, body):
+        """解析生成请求，返回(ExamCore, 完整配置, 份数)"""
+        try:
+            request = json.loads(body.decode('utf-8') or "{}")
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise HTTPError(400, f"请求体不是有效的JSON: {e}")
+        if not isinstance(request, dict):
+            raise HTTPError(400, "请求体必须是JSON对象")
+        
+        name = request.get('bank')
+        if name is None and len(self.banks) == 1:
+            name = next(iter(self.banks))
+        if name not in self.banks:
+            raise HTTPError(404, f"未加载题库: {name}")
+        
+        requested = request.get('config')
+        if requested is None:
+            requested = {}
+        if not isinstance(requested, dict):
+            raise HTTPError(400, "config必须是JSON对象")
+        unknown = set(requested) - set(DEFAULT_CONFIG)
+        if unknown:
+            raise HTTPError(400, f"未知的配置项: {', '.join(sorted(unknown))}")
+        config = self._complete_config(self.banks[name], requested)
+        
+        exam_count = request.get('exam_count', 1)
+        if not isinstance(exam_count, int) or not 1 <= exam_count <= MAX_EXAM_COUNT:
+            raise HTTPError(400, f"试卷份数必须是1到{MAX_EXAM_COUNT}之间的整数")
+        
+        return self.banks[name], config, exam_count
+    
+    def _complete_config(self, exam_core, requested):
+        """补全默认值并按题库的题型汇总检查配置，与GUI的输入校验一致"""
+        summary = exam_core.get_type_summary()
+        config = dict(DEFAULT_CONFIG)
+        for question_type, (include_key, _, start_key, end_key) in TYPE_KEYS.items():
+            item = summary.get(question_type)
+            if item is None:
+                config[include_key] = 0
+            else:
+                config[start_key], config[end_key] = item.first, item.last
+        available = sum(item.count for item in summary.values())
+        config['total_questions'] = min(config['total_questions'], available)
+        config.update(requested)
+        
+        for key in FLAG_KEYS:
+            if not isinstance(config[key], int) or config[key] not in (0, 1):
+                raise HTTPError(400, f"{key}必须是0或1")
+            config[key] = int(config[key])
+        for key in ('exam_title', 'student_name'):
+            if not isinstance(config[key], str):
+                raise HTTPError(400, f"{key}必须是字符串")
+        if config['export_mode'] not in EXPORT_MODES:
+            raise HTTPError(400, f"export_mode必须是{'、'.join(EXPORT_MODES)}之一")
+        if config['type_order'] not in TYPE_ORDERS:
+            raise HTTPError(400, f"type_order必须是{'、'.join(TYPE_ORDERS)}之一")
+        for key in ('include_ids', 'exclude_ids'):
+            if not isinstance(config[key], list) or not all(_is_int(value) for value in config[key]):
+                raise HTTPError(400, f"{key}必须是题号（整数）列表")
+        
+        mode = config['export_mode']
+        for question_type, (include_key, count_key, start_key, end_key) in TYPE_KEYS.items():
+            if not config[include_key]:
+                continue
+            item = summary.get(question_type)
+            if item is None:
+                raise HTTPError(400, f"题库中没有可用的{question_type}！")
+            if mode == "随机抽取":
+                _check_int(config, count_key, f"{question_type}数量", 1, item.count)
+            elif mode == "顺序导出":
+                _check_int(config, start_key, f"{question_type}起始题号", item.first, item.last)
+                _check_int(config, end_key, f"{question_type}结束题号", item.first, item.last)
+        if mode == "按比例导出":
+            _check_int(config, 'judgment_ratio', "判断题比例", 0, 100)
+            _check_int(config, 'mcq_ratio', "单选题比例", 0, 100)
+            _check_int(config, 'total_questions', "总题数", 1, available)
+        return config
+    
+    @contextlib.asynccontextmanager
+    async def _limited(self):
+        """占用一个并发名额，超出上限时排队等待"""
+        async with self._semaphore:
+            self._in_flight += 1
+            try:
+                yield
+            finally:
+                self._in_flight -= 1
+    
+    async def _run_in_executor(self, executor, func, *args):
+        """在线程池或渲染进程池中执行，配置错误(ValueError)转换为400"""
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+    
+    async def _run_limited(self, executor, func, *args):
+        """在并发上限内把任务交给线程池或渲染进程池执行"""
+        async with self._limited():
+            return await self._run_in_executor(executor, func, *args)
+    
+    def _append_records(self, records):
+        """导出完成后追加试卷记录（在工作线程中执行）"""
+        with self._record_lock:
+            append_records(records, self.record_log)
+    
+    async def _send_json(self, writer, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = (
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+    
+    async def _start_stream(self, writer, status, headers):
+        """发送分块传输编码的响应头"""
+        head = f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+        for key, value in headers.items():
+            head += f"{key}: {value}\r\n"
+        head += "Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n"
+        writer.write(head.encode('latin-1'))
+        await writer.drain()
+    
+    async def _write_chunk(self, writer, data):
+        """按STREAM_CHUNK_SIZE分块发送数据"""
+        view = memoryview(data)
+        for offset in range(0, len(view), STREAM_CHUNK_SIZE):
+            chunk = view[offset:offset + STREAM_CHUNK_SIZE]
+            writer.write(f"{len(chunk):X}\r\n".encode('latin-1'))
+            writer.write(chunk)
+            writer.write(b"\r\n")
+            await writer.drain()
+    
+    async def _end_stream(self, writer):
+        """发送结束块"""
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+    
+    def _record_latency(self, route, status, seconds):
+        self._latencies.setdefault(route, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+        counts = self._counts.setdefault(route, {})
+        counts[status] = counts.get(status, 0) + 1
+    
+    def metrics(self):
+        """返回请求数、并发数和各接口延迟统计（毫秒）"""
+        routes = {}
+        for route, samples in self._latencies.items():
+            ordered = sorted(samples)
+            percentile = lambda p: round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2)
+            routes[route] = {
+                'requests': {str(status): count for status, count in self._counts[route].items()},
+                'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+                'p50_ms': percentile(0.50),
+                'p95_ms': percentile(0.95),
+                'max_ms': round(ordered[-1] * 1000, 2),
+            }
+        return {
+            'uptime_s': round(time.time() - self._started_at, 1),
+            'in_flight': self._in_flight,
+            'max_concurrency': self.max_concurrency,
+            'routes': routes,
+        }
+
+class _ZipPacker:
+    """边写边取的.zip打包器：每加入一个文件返回新产生的字节"""
+    
+    def __init__(self):
+        # zipfile对不可定位的输出使用数据描述符，已写出的字节不会再被修改
+        self._output = _ChunkWriter()
+        self._archive = zipfile.ZipFile(self._output, 'w', zipfile.ZIP_DEFLATED)
+    
+    def add(self, name, data):
+        self._archive.writestr(name, data)
+        return self._output.take()
+    
+    def close(self):
+        self._archive.close()
+        return self._output.take()
+
+class _ChunkWriter:
+    """只写、不可定位的文件对象：缓冲写入的数据，由take()取走"""
+    
+    def __init__(self):
+        self._buffer = bytearray()
+    
+    def write(self, data):
+        self._buffer += data
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def take(self):
+        data = bytes(self._buffer)
+        self._buffer = bytearray()
+        return data
+
+# 渲染进程内的题库和文档构建器（每个进程各一份，跨请求复用）
+_worker_banks = {}
+_worker_builder = None
+
+def _init_render_worker(paths):
+    """渲染进程启动时预先加载服务已加载的题库"""
+    for path in paths:
+        _worker_bank(path, None)
+
+def _worker_bank(path, bank_hash):
+    """返回渲染进程中的题库，未加载或哈希不一致时（重新）加载"""
+    exam_core = _worker_banks.get(path)
+    if exam_core is None or (bank_hash is not None and exam_core.bank_hash != bank_hash):
+        exam_core = ExamCore()
+        exam_core.load_excel(path, build_search_index=False)
+        _worker_banks[path] = exam_core
+    return exam_core
+
+def _render_paper(record, exam_num, exam_count):
+    """在渲染进程中按试卷记录重现并渲染一份试卷，返回.docx字节"""
+    global _worker_builder
+    exam = _worker_bank(record['bank_path'], record['bank_hash']).regenerate(record)
+    if _worker_builder is None:
+        _worker_builder = ExamDocumentBuilder()
+    buffer = io.BytesIO()
+    _worker_builder.build(exam, exam_num, exam_count).save(buffer)
+    return buffer.getvalue()
+
+def _render_preview(path, bank_hash, config):
+    """在渲染进程中生成预览，返回(预览文本, 总题数)"""
+    return _worker_bank(path, bank_hash).generate_preview(config)
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def _check_int(config, key, label, low, high):
+    """检查配置项为[low, high]范围内的整数，否则返回400"""
+    if not _is_int(config[key]) or not low <= config[key] <= high:
+        raise HTTPError(400, f"{label}必须是{low}到{high}之间的整数！")
+
+def parse_bank_args(values):
+    """将["名称=路径", "路径"]解析为{名称: 路径}，未给名称时使用文件名"""
+    banks = {}
+    for value in values:
+        name, sep, path = value.partition('=')
+        if not sep:
+            path = value
+            name = os.path.splitext(os.path.basename(value))[0]
+        banks[name] = path
+    return banks
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""
+考试试卷生成系统 - 题库快照并发压力测试
+
+功能：
+1. 生成两个内容不同的模拟题库，各保存为xlsx并编译为.qbank
+2. 多个线程持续调用generate_exam_batch、generate_preview和search
+3. 主线程同时在xlsx和.qbank题库之间反复重新加载
+4. 检查每份试卷的题目、选项和答案与其bank_hash对应的题库一致，
+   每次预览和检索的结果都来自同一个题库
+
+任何线程抛出异常或检查不通过时以非零状态退出。
+
+用法：
+- python stress_test.py [--threads 8] [--reloads 30] [--count 2000]
+
+依赖：
+- core.ExamCore
+- pandas
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import pandas as pd
+from core import ExamCore, OPTION_COLUMNS, OPTION_LETTERS
+
+# 生成线程使用的配置（题数对两个题库都有效）
+CONFIG = {
+    'export_mode': "随机抽取",
+    'include_judgment': 1,
+    'include_mcq': 1,
+    'include_answers': 1,
+    'exam_title': "压力测试",
+    'student_name': "",
+    'type_order': "判断题→单选题",
+    'random_order': 1,
+    'shuffle_options': 1,
+    'judgment_count': 20,
+    'mcq_count': 20,
+    'judgment_ratio': 0,
+    'mcq_ratio': 0,
+    'total_questions': 0,
+    'judgment_start': 0,
+    'judgment_end': 0,
+    'mcq_start': 0,
+    'mcq_end': 0,
+}
+
+def make_bank(prefix, count):
+    """生成题目文本均以prefix开头的模拟题库"""
+    rows = []
+    for i in range(count):
+        if i % 2 == 0:
+            rows.append({'题型': '判断题', '题目': f"{prefix}判断题{i}", '正确答案': i % 4 // 2,
+                         '选项A': None, '选项B': None, '选项C': None, '选项D': None})
+        else:
+            rows.append({'题型': '单选题', '题目': f"{prefix}单选题{i}", '正确答案': "ABCD"[i % 4],
+                         '选项A': f"{prefix}{i}-1", '选项B': f"{prefix}{i}-2",
+                         '选项C': f"{prefix}{i}-3", '选项D': f"{prefix}{i}-4"})
+    return pd.DataFrame(rows)
+
+def expected_questions(exam_core):
+    """返回{题号: (题目, 选项文本集合, 正确答案文本)}，单选题答案为对应选项的文本"""
+    expected = {}
+    for row in exam_core.exam_data.itertuples(index=False):
+        row = row._asdict()
+        options = [row[col] for col in OPTION_COLUMNS if isinstance(row[col], str)]
+        answer = row['正确答案']
+        if row['题型'] == '单选题':
+            answer = row[OPTION_COLUMNS[OPTION_LETTERS.index(answer)]]
+        expected[row['题号']] = (row['题目'], sorted(options), answer)
+    return expected
+
+def check_exam(exam, banks):
+    """检查试卷内容与bank_hash对应的题库一致，返回问题描述或None"""
+    expected = banks.get(exam['bank_hash'])
+    if expected is None:
+        return f"未知的题库哈希: {exam['bank_hash']}"
+    for section in exam['sections']:
+        for question in section['questions']:
+            text, options, answer = expected[question['id']]
+            shown = dict(question['options'])
+            if question['text'] != text or sorted(shown.values()) != options:
+                return f"第{question['id']}题内容与题库{exam['bank_hash'][:8]}不一致"
+            actual = shown.get(question['answer'], question['answer'])
+            if actual != answer:
+                return f"第{question['id']}题答案与题库{exam['bank_hash'][:8]}不一致"
+    return None
+
+def check_single_bank(texts, prefixes):
+    """检查一次预览或检索中出现的题目都来自同一个题库"""
+    found = {prefix for prefix in prefixes if any(prefix in text for text in texts)}
+    if len(found) > 1:
+        return f"同一结果中混有多个题库的题目: {sorted(found)}"
+    return None
+
+def worker(exam_core, banks, prefixes, stop, failures, counters, index):
+    """循环生成试卷、预览和检索，出错时记录到failures"""
+    while not stop.is_set():
+        try:
+            step = counters[index] % 3
+            if step == 0:
+                for exam in exam_core.generate_exam_batch(CONFIG, 3):
+                    problem = check_exam(exam, banks)
+                    if problem:
+                        failures.append(problem)
+            elif step == 1:
+                content, _ = exam_core.generate_preview(CONFIG)
+                problem = check_single_bank([content], prefixes)
+                if problem:
+                    failures.append(problem)
+            else:
+                results, _ = exam_core.search("单选题", limit=50)
+                problem = check_single_bank([item['题目'] for item in results], prefixes)
+                if problem:
+                    failures.append(problem)
+            counters[index] += 1
+        except Exception:
+            failures.append(traceback.format_exc())
+            stop.set()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="重新加载题库时并发生成试卷的压力测试")
+    parser.add_argument("--threads", type=int, default=8, help="生成线程数")
+    parser.add_argument("--reloads", type=int, default=30, help="主线程重新加载次数")
+    parser.add_argument("--count", type=int, default=2000, help="每个模拟题库的题数")
+    args = parser.parse_args(argv)
+    
+    prefixes = ["甲库", "乙库"]
+    with tempfile.TemporaryDirectory() as directory:
+        # 两个题库题数不同，各有xlsx和.qbank两种形式
+        paths = []
+        banks = {}
+        for number, prefix in enumerate(prefixes):
+            xlsx_path = os.path.join(directory, f"bank{number}.xlsx")
+            qbank_path = os.path.join(directory, f"bank{number}.qbank")
+            make_bank(prefix, args.count + number * 100).to_excel(xlsx_path, index=False)
+            exam_core = ExamCore()
+            exam_core.load_excel(xlsx_path)
+            exam_core.compile_bank(qbank_path)
+            banks[exam_core.bank_hash] = expected_questions(exam_core)
+            paths.extend([xlsx_path, qbank_path])
+        # 交替加载两个题库，并在xlsx和.qbank之间切换
+        paths = [paths[0], paths[3], paths[2], paths[1]]
+        
+        exam_core = ExamCore()
+        exam_core.load_excel(paths[0])
+        stop = threading.Event()
+        failures = []
+        counters = [0] * args.threads
+        threads = [
+            threading.Thread(target=worker, args=(exam_core, banks, prefixes, stop, failures, counters, i))
+            for i in range(args.threads)
+        ]
+        for thread in threads:
+            thread.start()
+        
+        start = time.perf_counter()
+        try:
+            for reload in range(args.reloads):
+                if stop.is_set():
+                    break
+                exam_core.load_excel(paths[(reload + 1) % len(paths)])
+        except Exception:
+            failures.append(traceback.format_exc())
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - start
+    
+    print(f"{args.threads}个线程，重新加载{args.reloads}次，耗时{elapsed:.1f}秒，"
+          f"完成{sum(counters)}次生成/预览/检索")
+    if failures:
+        print(f"发现{len(failures)}个问题:")
+        for failure in failures[:20]:
+            print(failure)
+        return 1
+    print("全部检查通过")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file